@@ -8,6 +8,10 @@ from tkinter import filedialog
 from tkinter import messagebox
 from tkinter.messagebox import showwarning
 import sys
+import yaml
+from .app_files.cache import survey_cache_dir
+from .app_files.catalog import compile_data_source
+from .app_files.utils import build_taxonomy_sidecar
 from .make_app import make_app
 
 __all__ = ["make_app"]
@@ -169,6 +173,67 @@ fieldsurveys
     print("=================================================")
 
 
+def enrich_data_sources(config_file=None, csv_dir=None, sidecar_path=None):
+    if config_file is None:
+        show_information(
+            "yaml file",
+            "Kindly select the survey.yaml file of the app whose data sources should be enriched",
+        )
+        filetypes = [("YAML files", "*.yaml")]
+        selected = select_file("survey.yaml", filetypes)
+        config_file = (
+            selected[0]
+            if selected
+            else os.path.join(os.path.dirname(__file__), "survey.yaml")
+        )
+
+    if csv_dir is None:
+        csv_dir = os.path.join(os.path.dirname(os.path.abspath(config_file)), "data")
+
+    with open(config_file, "r") as file:
+        survey_config = yaml.safe_load(file)
+
+    print(f"Classifying the data sources in {csv_dir}")
+    sources = build_taxonomy_sidecar(survey_config, csv_dir, sidecar_path)
+    for data_source, entries in sources.items():
+        print(f"{data_source}: {len(entries)} specimens classified")
+    print("Taxonomy sidecar written. Redeploy the app to use it.")
+
+
+def compile_data_sources(config_file=None, csv_dir=None):
+    if config_file is None:
+        show_information(
+            "yaml file",
+            "Kindly select the survey.yaml file of the app whose data sources should be compiled",
+        )
+        filetypes = [("YAML files", "*.yaml")]
+        selected = select_file("survey.yaml", filetypes)
+        config_file = (
+            selected[0]
+            if selected
+            else os.path.join(os.path.dirname(__file__), "survey.yaml")
+        )
+
+    if csv_dir is None:
+        csv_dir = os.path.join(os.path.dirname(os.path.abspath(config_file)), "data")
+
+    with open(config_file, "r") as file:
+        survey_config = yaml.safe_load(file)
+
+    compiled_dir = os.path.join(
+        survey_cache_dir(config_file, survey_config.get("cache_dir")), "catalog"
+    )
+    print(f"Compiling the data sources in {csv_dir}")
+    for data_source in survey_config.get("survey_data_sources", []):
+        compile_data_source(
+            os.path.join(csv_dir, f"{data_source}.csv"),
+            os.path.join(compiled_dir, data_source),
+            data_source,
+        )
+        print(f"{data_source}: compiled")
+    print(f"Compiled data sources written to {compiled_dir}")
+
+
 def select_directory() -> str:
     directory_path = filedialog.askdirectory(title="Select Directory")
 
@@ -0,0 +1,76 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+# blocking lookups (HTTP, geocoding, ...) run here so they never stall the event
+# loop; the pool is shared by all sessions to bound the number of threads
+executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="fieldsurveys")
+
+# speculative work such as cache warm-up gets its own small pool so it can never
+# hold up lookups a surveyor is waiting for
+low_priority_executor = ThreadPoolExecutor(
+    max_workers=2, thread_name_prefix="fieldsurveys-low-priority"
+)
+
+
+async def run_in_background(func, *args, **kwargs):
+    """
+    Runs a blocking function in the shared thread pool and awaits its result.
+
+    Args:
+        func (callable): The blocking function to run.
+        *args: Positional arguments passed to the function.
+        **kwargs: Keyword arguments passed to the function.
+
+    Returns:
+        The return value of the function.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+async def run_in_low_priority(func, *args, **kwargs):
+    """
+    Same as run_in_background, but runs the function in the low priority pool.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        low_priority_executor, functools.partial(func, *args, **kwargs)
+    )
+
+
+async def gather_as_completed(calls, timeout, on_result):
+    """
+    Runs several blocking functions concurrently and reports each result as soon
+    as it is available, giving up on the ones still running after `timeout`.
+
+    Args:
+        calls (dict): Maps a name to a (func, args) tuple.
+        timeout (float): The overall deadline in seconds.
+        on_result (callable): Awaited with (name, result, error) for every call,
+            with error set to an exception if the call failed or timed out.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    pending = {
+        asyncio.ensure_future(run_in_background(func, *args)): name
+        for name, (func, args) in calls.items()
+    }
+    try:
+        while pending:
+            done, _ = await asyncio.wait(
+                pending,
+                timeout=max(deadline - loop.time(), 0),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                break
+            for future in done:
+                name = pending.pop(future)
+                error = future.exception()
+                await on_result(name, None if error else future.result(), error)
+        for future, name in pending.items():
+            await on_result(name, None, asyncio.TimeoutError(f"{name} timed out"))
+    finally:
+        for future in pending:
+            future.cancel()
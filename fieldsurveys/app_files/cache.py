@@ -0,0 +1,255 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def user_cache_dir(app_name="fieldsurveys"):
+    """
+    Returns the directory the current user's caches of an application go in:
+    under %LOCALAPPDATA% on Windows, ~/Library/Caches on macOS and
+    $XDG_CACHE_HOME (~/.cache by default) elsewhere.
+    """
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser(
+            os.path.join("~", "AppData", "Local")
+        )
+        return os.path.join(base, app_name, "Cache")
+    if sys.platform == "darwin":
+        return os.path.join(os.path.expanduser("~/Library/Caches"), app_name)
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, app_name)
+
+
+def survey_cache_dir(survey_path, cache_dir=None):
+    """
+    Returns the directory the caches of a survey go in.
+
+    Args:
+        survey_path (str): The path of survey.yaml.
+        cache_dir (str): The `cache_dir` configured in survey.yaml, relative to
+            the directory of survey.yaml. Without one the caches go in the
+            user's cache directory, in a directory of their own for every
+            survey, since survey.yaml may be installed read-only (e.g. the
+            bundled one in site-packages).
+
+    Returns:
+        str: The absolute path of the directory.
+    """
+    survey_dir = os.path.dirname(os.path.abspath(survey_path))
+    if cache_dir:
+        return os.path.join(survey_dir, cache_dir)
+    survey_id = hashlib.sha256(survey_dir.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(user_cache_dir(), survey_id)
+
+
+class PersistentCache:
+    """
+    A small key/value cache stored in a SQLite database.
+
+    Entries expire after `ttl` seconds and the least recently used entries are
+    evicted once the cache holds more than `max_entries` rows. Recently used
+    entries are also kept in memory so repeat lookups do not touch the disk;
+    the times they were used are written in one batch at most every
+    `touch_interval` seconds, and before entries are evicted, so the entries
+    used most stay in the cache. Values must be JSON serializable. Passing
+    ":memory:" as the path keeps the cache in memory for the lifetime of the
+    process.
+
+    Args:
+        path (str): The path of the SQLite database file, or ":memory:".
+        ttl (float): The number of seconds an entry stays valid.
+        max_entries (int): The maximum number of entries kept in the cache.
+        touch_interval (float): The number of seconds between two writes of
+            the times entries found in memory were used.
+    """
+
+    def __init__(
+        self,
+        path=":memory:",
+        ttl=30 * 24 * 60 * 60,
+        max_entries=10000,
+        touch_interval=60,
+    ):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        # key -> time it was last found in memory, not yet written
+        self._touched = {}
+        self._touches_written = time.time()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)"
+            )
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            if key in self._memory:
+                value, created = self._memory[key]
+                if now - created <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self._touched[key] = now
+                    if now - self._touches_written >= self.touch_interval:
+                        with self._conn:
+                            self._write_touches(now)
+                    return value
+                del self._memory[key]
+                self._touched.pop(key, None)
+
+            row = self._conn.execute(
+                "SELECT value, created FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return default
+            value, created = json.loads(row[0]), row[1]
+            with self._conn:
+                if now - created > self.ttl:
+                    self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    return default
+                self._conn.execute(
+                    "UPDATE cache SET accessed = ? WHERE key = ?", (now, key)
+                )
+            self._remember(key, value, created)
+        return value
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._touched.pop(key, None)
+                self._write_touches(now)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, created, accessed) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), now, now),
+                )
+                self._conn.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache "
+                    "ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            self._remember(key, value, now)
+
+    def clear(self):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM cache")
+            self._memory.clear()
+            self._touched.clear()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def _write_touches(self, now):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE cache SET accessed = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._touched.items()],
+            )
+            self._touched.clear()
+        self._touches_written = now
+
+    def _remember(self, key, value, created):
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+
+class MemoryCache:
+    """
+    A thread-safe, size-bounded in-memory cache whose entries expire.
+
+    The least recently used entries are evicted once the cache holds more than
+    `max_entries` entries. One instance is meant to be shared by all sessions
+    of the process. Hits and misses are counted, see `stats`.
+
+    Args:
+        ttl (float): The number of seconds an entry stays valid.
+        max_entries (int): The maximum number of entries kept in the cache.
+    """
+
+    def __init__(self, ttl=24 * 60 * 60, max_entries=2048):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # striped locks so concurrent misses for one key compute it once
+        self._compute_locks = [threading.Lock() for _ in range(32)]
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            value, created = self._entries[key]
+            if now - created > self.ttl:
+                del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached value of `key`, calling `compute()` to fill it in on a
+        miss. Callers missing the same key at the same time wait for the first
+        one instead of computing it again.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._compute_locks[hash(key) % len(self._compute_locks)]:
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] <= self.ttl:
+                return entry[0]
+            value = compute()
+            self.set(key, value)
+            return value
+
+    def stats(self):
+        """
+        Returns the number of hits, misses and entries of the cache.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
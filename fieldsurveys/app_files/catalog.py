@@ -0,0 +1,695 @@
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from .search import SearchIndex
+
+# the values the specimen selector can show, see SpeciesIndex
+ALPHA_CODE = "Alpha Code"
+COMMON_NAME = "Common Name"
+BINOMIAL = "Genus Species"
+DISPLAY_MODES = [ALPHA_CODE, COMMON_NAME, BINOMIAL]
+# what a key on several rows is shown with, in every display mode
+_QUALIFIERS = {
+    ALPHA_CODE: [BINOMIAL, COMMON_NAME],
+    COMMON_NAME: [BINOMIAL, ALPHA_CODE],
+    BINOMIAL: [COMMON_NAME, ALPHA_CODE],
+}
+
+# bump when the layout of compiled data sources changes, so older ones are rebuilt
+COMPILED_FORMAT = 3
+
+
+class SpeciesCatalog:
+    """
+    The species lists of a survey, parsed once per process and shared by every
+    session.
+
+    A data source is read the first time it is requested, from its compiled
+    form if a `compiled_dir` is given (see `compile_data_source`) and from its
+    CSV otherwise, and kept as a SpeciesIndex only. Compiled data sources stay
+    memory-mapped, so the processes serving the same survey share them.
+
+    `reload` rebuilds the data sources whose CSV changed and swaps each one in
+    at once. Indexes handed out earlier keep referring to the version they
+    were taken from.
+
+    Args:
+        csv_dir (str): The directory containing the data source CSV files.
+        data_sources (list): The names of the data sources.
+        compiled_dir (str): The directory of the compiled data sources. Data
+            sources missing there or whose CSV changed are compiled on load.
+    """
+
+    def __init__(self, csv_dir, data_sources, compiled_dir=None):
+        self.csv_dir = csv_dir
+        self.data_sources = list(data_sources)
+        self.compiled_dir = compiled_dir
+        # data source -> SpeciesIndex, replaced as a whole on reload
+        self._indexes = {}
+        self._signatures = {}
+        # the CSVs that failed to reload, so they are only retried once changed
+        self._failed_signatures = {}
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+
+    def get(self, data_source):
+        """
+        Returns the species list of a data source.
+
+        Args:
+            data_source (str): The name of the data source.
+
+        Returns:
+            pandas.DataFrame: A new DataFrame of the species list, see
+                SpeciesIndex.to_frame.
+        """
+        return self.index(data_source).to_frame()
+
+    def index(self, data_source):
+        """
+        Returns the lookup index of a data source.
+
+        Args:
+            data_source (str): The name of the data source.
+
+        Returns:
+            SpeciesIndex: The index.
+        """
+        return self._ensure_loaded(data_source)
+
+    def load_all(self):
+        """
+        Loads every data source now instead of on first use.
+        """
+        for data_source in self.data_sources:
+            self._ensure_loaded(data_source)
+
+    def memory_usage(self, mapped=False):
+        """
+        Returns the number of bytes every loaded data source holds in memory,
+        or with `mapped` the size of its memory-mapped arrays.
+        """
+        return {
+            data_source: index.memory_usage(mapped)
+            for data_source, index in self._indexes.items()
+        }
+
+    def reload(self, data_sources=None):
+        """
+        Rebuilds the loaded data sources whose CSV changed since they were
+        loaded. A data source that fails to load keeps its current version.
+
+        Args:
+            data_sources (list): The new names of the data sources, e.g. read
+                again from survey.yaml. New ones are loaded right away, the ones
+                no longer listed are dropped. Data sources without a CSV are
+                left out. None keeps the current list.
+
+        Returns:
+            list: The names of the data sources that were (re)loaded.
+        """
+        with self._reload_lock:
+            if data_sources is None:
+                data_sources = self.data_sources
+            available = []
+            for data_source in data_sources:
+                if self._signature(data_source) is None:
+                    print(f"Data source {data_source}.csv is missing, it is not loaded")
+                else:
+                    available.append(data_source)
+
+            # the new versions are built without holding the lock readers take
+            loaded = {}
+            for data_source in available:
+                signature = self._signature(data_source)
+                if signature in (
+                    self._signatures.get(data_source),
+                    self._failed_signatures.get(data_source),
+                ):
+                    continue
+                try:
+                    loaded[data_source] = (self._load(data_source), signature)
+                    self._failed_signatures.pop(data_source, None)
+                except Exception as e:
+                    print(f"Could not reload data source {data_source}: {e}")
+                    self._failed_signatures[data_source] = signature
+
+            with self._lock:
+                self.data_sources = available
+                for data_source, (index, signature) in loaded.items():
+                    self._indexes[data_source] = index
+                    self._signatures[data_source] = signature
+                for data_source in set(self._indexes) - set(available):
+                    del self._indexes[data_source]
+                    del self._signatures[data_source]
+            return sorted(loaded)
+
+    def _ensure_loaded(self, data_source):
+        index = self._indexes.get(data_source)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(data_source)
+                if index is None:
+                    if data_source not in self.data_sources:
+                        raise KeyError(f"Unknown data source: {data_source}")
+                    signature = self._signature(data_source)
+                    index = self._load(data_source)
+                    self._indexes[data_source] = index
+                    self._signatures[data_source] = signature
+        return index
+
+    def _csv_path(self, data_source):
+        return os.path.join(self.csv_dir, f"{data_source}.csv")
+
+    def _signature(self, data_source):
+        return _file_signature(self._csv_path(data_source))
+
+    def _load(self, data_source):
+        csv_path = self._csv_path(data_source)
+        if self.compiled_dir is None:
+            index = SpeciesIndex(read_data_source(csv_path), data_source)
+        else:
+            path = os.path.join(self.compiled_dir, data_source)
+            if is_compiled(path, csv_path):
+                version = compiled_version(path, csv_path)
+            else:
+                version = compile_data_source(csv_path, path, data_source)
+            index = load_compiled_data_source(version)
+        size = index.memory_usage() / 1024
+        mapped = index.memory_usage(mapped=True) / 1024
+        print(
+            f"Loaded data source {data_source}: {len(index)} species, "
+            f"{size:.0f} KiB in memory, {mapped:.0f} KiB mapped"
+        )
+        return index
+
+
+class CatalogWatcher:
+    """
+    Reloads a catalog in a background thread when the CSV of a data source or
+    the list of data sources in survey.yaml changes, so species lists can be
+    updated without restarting the server. Both are polled; stat-ing a few
+    files every couple of seconds costs next to nothing.
+
+    Args:
+        catalog (SpeciesCatalog): The catalog to reload.
+        survey_path (str): The path of survey.yaml.
+        interval (float): The number of seconds between two checks.
+    """
+
+    def __init__(self, catalog, survey_path, interval=2.0):
+        self.catalog = catalog
+        self.survey_path = survey_path
+        self.interval = interval
+        self._survey_signature = _file_signature(survey_path)
+        self._stop = threading.Event()
+
+    def start(self):
+        thread = threading.Thread(
+            target=self._run, name="fieldsurveys-catalog-watcher", daemon=True
+        )
+        thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def check(self):
+        """
+        Reloads what changed since the last check.
+
+        Returns:
+            list: The names of the data sources that were (re)loaded.
+        """
+        data_sources = None
+        signature = _file_signature(self.survey_path)
+        if signature != self._survey_signature:
+            self._survey_signature = signature
+            try:
+                with open(self.survey_path, "r") as file:
+                    data_sources = yaml.safe_load(file)["survey_data_sources"]
+            except Exception as e:
+                print(f"Could not reload {self.survey_path}: {e}")
+        return self.catalog.reload(data_sources)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Could not reload the species lists: {e}")
+
+
+def _file_signature(path):
+    # cheap to compare on every poll, unlike the checksum computed on load
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def read_data_source(csv_path):
+    """
+    Parses the CSV of a data source.
+    """
+    df = pd.read_csv(csv_path, keep_default_na=False)
+    if ALPHA_CODE not in df.columns:
+        df[ALPHA_CODE] = None
+    return df
+
+
+def checksum(csv_path):
+    """
+    Returns the checksum a compiled data source is matched with its CSV by.
+    """
+    digest = hashlib.sha256(f"format {COMPILED_FORMAT}\n".encode())
+    with open(csv_path, "rb") as file:
+        digest.update(file.read())
+    return digest.hexdigest()
+
+
+def compiled_version(path, csv_path):
+    """
+    Returns the directory a data source CSV is compiled to under `path`.
+    """
+    return os.path.join(path, checksum(csv_path))
+
+
+def is_compiled(path, csv_path):
+    """
+    Returns whether the data source compiled under `path` is up to date with
+    its CSV.
+    """
+    return os.path.exists(os.path.join(compiled_version(path, csv_path), "meta.json"))
+
+
+def compile_data_source(csv_path, path, data_source=""):
+    """
+    Compiles a data source CSV into a directory of arrays that are loaded
+    memory-mapped, without parsing, see `SpeciesIndex.to_arrays`.
+
+    Lists of strings are stored UTF-8 encoded back to back, with the offset
+    each one starts at in `<name>.offsets.npy`. `meta.json` records the
+    columns and their dtypes, the keys on several rows, the arrays and the
+    checksum of the CSV.
+
+    Every version is written to its own directory under `path`, named after
+    the checksum of the CSV, which appears at once when it is complete. Several
+    processes compiling the same data source at the same time therefore never
+    see each other's partial writes, and a process that finds the directory of
+    its CSV already there can use it as it is. The other versions are removed.
+
+    Args:
+        csv_path (str): The path of the CSV file.
+        path (str): The directory of the compiled versions of the data source.
+        data_source (str): The name of the data source, used in warnings.
+
+    Returns:
+        str: The directory of the compiled version.
+    """
+    version = compiled_version(path, csv_path)
+    df = read_data_source(csv_path)
+    index = SpeciesIndex(df, data_source)
+    arrays = index.to_arrays()
+    meta = {
+        "checksum": os.path.basename(version),
+        "columns": index.columns,
+        "dtypes": index.dtypes,
+        "rows": len(df),
+        "duplicates": index.duplicates,
+        "arrays": sorted(arrays),
+        "text": sorted(
+            name for name, array in arrays.items() if not isinstance(array, np.ndarray)
+        ),
+    }
+
+    os.makedirs(path, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=path, prefix=".compiling-")
+    try:
+        for name, array in arrays.items():
+            if not isinstance(array, np.ndarray):
+                encoded = [string.encode("utf-8") for string in array]
+                offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+                offsets[1:] = np.cumsum([len(string) for string in encoded])
+                np.save(os.path.join(staging, f"{name}.offsets.npy"), offsets)
+                array = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+            np.save(os.path.join(staging, f"{name}.npy"), array)
+        with open(os.path.join(staging, "meta.json"), "w") as file:
+            json.dump(meta, file)
+        try:
+            os.replace(staging, version)
+        except OSError:
+            # another process compiled the same CSV first
+            if not os.path.exists(os.path.join(version, "meta.json")):
+                raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    for name in os.listdir(path):
+        other = os.path.join(path, name)
+        if name.startswith(".") or other == version:
+            continue
+        if os.path.isdir(other):
+            shutil.rmtree(other, ignore_errors=True)
+        else:
+            os.remove(other)
+    return version
+
+
+def load_compiled_data_source(path):
+    """
+    Loads a data source written by `compile_data_source`. The arrays stay
+    memory-mapped and strings are only decoded when they are read.
+
+    Args:
+        path (str): The directory of the compiled version.
+
+    Returns:
+        SpeciesIndex: The index of the species list.
+    """
+    with open(os.path.join(path, "meta.json")) as file:
+        meta = json.load(file)
+    arrays = {}
+    for name in meta["arrays"]:
+        array = _load_mapped(os.path.join(path, f"{name}.npy"))
+        if name in meta["text"]:
+            array = StringArray(
+                array, _load_mapped(os.path.join(path, f"{name}.offsets.npy"))
+            )
+        arrays[name] = array
+    return SpeciesIndex.from_arrays(
+        arrays, meta["columns"], meta["dtypes"], meta["duplicates"]
+    )
+
+
+def _load_mapped(path):
+    # a plain view of the mapped file: indexing a numpy.memmap is much slower
+    return np.load(path, mmap_mode="r").view(np.ndarray)
+
+
+def _is_mapped(array):
+    while array is not None:
+        if isinstance(array, mmap.mmap):
+            return True
+        array = getattr(array, "base", None)
+    return False
+
+
+class StringArray:
+    """
+    A sorted list of strings stored UTF-8 encoded back to back, decoded one at
+    a time when read, so a memory-mapped list is never loaded as a whole. It
+    can be searched with `bisect` like a list.
+
+    Args:
+        data (numpy.ndarray): The encoded strings, as bytes.
+        offsets (numpy.ndarray): Where every string starts in `data`, and where
+            the last one ends.
+    """
+
+    def __init__(self, data, offsets):
+        self._data = data
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        start, end = self._offsets[position : position + 2]
+        return self._data[start:end].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        data = self._data.tobytes()
+        offsets = self._offsets.tolist()
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            yield data[start:end].decode("utf-8")
+
+
+class SpeciesIndex:
+    """
+    Finds the row of a species list from the value shown in the specimen
+    selector, for every display mode: the alpha code, the common name or the
+    binomial ("Genus Species").
+
+    The list is held as arrays rather than as Python objects. Every distinct
+    string of it is interned once, in sorted order (`strings`), and `codes`
+    holds the number of the string of every cell of a text column, -1 for an
+    empty one; other columns are kept as they are (`values_<position>`).
+    `key_codes` holds the string of every row for every display mode and
+    `first_rows` the first row of every string, so a value shown in the
+    selector is found with a binary search of `strings`. Loaded from its
+    compiled form (`from_arrays`), every array stays memory-mapped.
+
+    Keys that appear on several rows are reported when the index is built and
+    shown with the binomial of their row, or its common name in the binomial
+    mode, e.g. "ACMI (Achillea millefolium)", adding the remaining value when
+    that is not enough to tell the rows apart. The bare key finds no row.
+
+    Args:
+        df (pandas.DataFrame): The species list. Its alpha code, common name,
+            genus and species columns are text.
+        name (str): The name of the data source, used in warnings.
+    """
+
+    def __init__(self, df, name=""):
+        columns = list(df.columns)
+        dtypes = {column: str(df[column].dtype) for column in columns}
+        text_columns = [column for column in columns if dtypes[column] == "object"]
+        keys = {
+            ALPHA_CODE: df[ALPHA_CODE].to_numpy(dtype=object),
+            COMMON_NAME: df[COMMON_NAME].to_numpy(dtype=object),
+            BINOMIAL: (df["Genus"] + " " + df["Species"]).to_numpy(dtype=object),
+        }
+        # a key on several rows is shown with what tells the rows apart, e.g.
+        # "ACMI (Achillea millefolium)", so every choice finds its own row
+        labels = {}
+        duplicates = {}
+        for mode in DISPLAY_MODES:
+            mode_keys = pd.Series(keys[mode])
+            repeated = (
+                mode_keys.notna() & (mode_keys != "") & mode_keys.duplicated(keep=False)
+            )
+            mode_labels = mode_keys.copy()
+            qualifier = None
+            for other in _QUALIFIERS[mode]:
+                values = pd.Series(keys[other]).fillna("")
+                qualifier = values if qualifier is None else qualifier + ", " + values
+                ambiguous = repeated & mode_labels.duplicated(keep=False)
+                mode_labels[ambiguous] = (
+                    mode_keys[ambiguous] + " (" + qualifier[ambiguous] + ")"
+                )
+            labels[mode] = mode_labels.to_numpy(dtype=object)
+            duplicates[mode] = sorted(set(mode_keys[repeated]))
+            if duplicates[mode]:
+                examples = ", ".join(duplicates[mode][:5])
+                print(
+                    f"Data source {name}: {len(duplicates[mode])} {mode} value(s) "
+                    f"appear on several rows and are shown with the "
+                    f"{' and '.join(_QUALIFIERS[mode])} of each (e.g. {examples})"
+                )
+        cells = np.concatenate(
+            [df[column].to_numpy(dtype=object) for column in text_columns]
+            + [labels[mode] for mode in DISPLAY_MODES]
+        )
+        present = np.array([value is not None for value in cells], dtype=bool)
+        strings, inverse = np.unique(cells[present].astype(str), return_inverse=True)
+        all_codes = np.full(len(cells), -1, dtype=np.int32)
+        all_codes[present] = inverse
+        all_codes = all_codes.reshape(len(text_columns) + len(DISPLAY_MODES), len(df)).T
+
+        codes = np.ascontiguousarray(all_codes[:, : len(text_columns)])
+        key_codes = np.ascontiguousarray(all_codes[:, len(text_columns) :])
+        # empty keys find no row
+        for position, mode in enumerate(DISPLAY_MODES):
+            key_codes[keys[mode] == "", position] = -1
+        # a label still on several rows, e.g. of a row listed twice, finds the
+        # first of them
+        first_rows = np.full((len(DISPLAY_MODES), len(strings)), -1, dtype=np.int32)
+        for position in range(len(DISPLAY_MODES)):
+            mode_codes, rows = np.unique(key_codes[:, position], return_index=True)
+            present = mode_codes >= 0
+            first_rows[position, mode_codes[present]] = rows[present]
+
+        arrays = {
+            "strings": strings.tolist(),
+            "codes": codes,
+            "key_codes": key_codes,
+            "first_rows": first_rows,
+        }
+        for position, column in enumerate(columns):
+            if column not in text_columns:
+                arrays[f"values_{position}"] = df[column].to_numpy()
+        # any display value finds a row, whatever the display mode
+        search_index = SearchIndex(
+            [
+                f"{alpha_code or ''} {common_name} {binomial}"
+                for alpha_code, common_name, binomial in zip(*keys.values())
+            ]
+        )
+        for array_name, array in search_index.to_arrays().items():
+            arrays[f"search_{array_name}"] = array
+        self._load(arrays, columns, dtypes)
+        self.duplicates = duplicates
+
+    @classmethod
+    def from_arrays(cls, arrays, columns, dtypes, duplicates=None):
+        """
+        Restores an index from the arrays returned by `to_arrays`, which is much
+        faster than building it again. The arrays are used as they are.
+
+        Args:
+            arrays (dict): The arrays, by name.
+            columns (list): The columns of the species list, in order.
+            dtypes (dict): The dtype of every column, by name.
+            duplicates (dict): The keys that appear on several rows, by
+                display mode.
+        """
+        index = cls.__new__(cls)
+        index._load(arrays, columns, dtypes)
+        index.duplicates = duplicates or dict.fromkeys(DISPLAY_MODES, [])
+        return index
+
+    def _load(self, arrays, columns, dtypes):
+        self._arrays = arrays
+        self.columns = list(columns)
+        self.dtypes = dict(dtypes)
+        self._strings = arrays["strings"]
+        self._key_codes = arrays["key_codes"]
+        self._first_rows = arrays["first_rows"]
+        # column -> (whether it holds codes of strings, its values)
+        self._values = {}
+        text_position = 0
+        for position, column in enumerate(self.columns):
+            if self.dtypes[column] == "object":
+                self._values[column] = (True, arrays["codes"][:, text_position])
+                text_position += 1
+            else:
+                self._values[column] = (False, arrays[f"values_{position}"])
+        self.search_index = SearchIndex.from_arrays(
+            {
+                array_name[len("search_") :]: array
+                for array_name, array in arrays.items()
+                if array_name.startswith("search_")
+            }
+        )
+
+    def __len__(self):
+        return len(self._key_codes)
+
+    def to_arrays(self):
+        """
+        Returns the arrays the index is made of, by name, for
+        `compile_data_source`. Lists of strings are returned as sorted
+        sequences of strings.
+        """
+        return dict(self._arrays)
+
+    def to_frame(self):
+        """
+        Returns the species list as a new DataFrame, with the dtypes it was
+        read with.
+        """
+        strings = np.array(list(self._strings) + [None], dtype=object)
+        data = {}
+        for column in self.columns:
+            is_text, values = self._values[column]
+            # the extra None is what the -1 code of an empty cell picks
+            values = strings[values] if is_text else np.array(values)
+            data[column] = pd.Series(values, dtype=self.dtypes[column])
+        return pd.DataFrame(data, columns=self.columns)
+
+    def memory_usage(self, mapped=False):
+        """
+        Returns the number of bytes the index holds in memory, or with `mapped`
+        the size of its memory-mapped arrays, which the OS pages in as they are
+        read and can drop again.
+        """
+        arrays = []
+        for array in self._arrays.values():
+            if isinstance(array, StringArray):
+                arrays.extend([array._data, array._offsets])
+            else:
+                arrays.append(array)
+        size = 0
+        for array in arrays:
+            if isinstance(array, np.ndarray):
+                if _is_mapped(array) == mapped:
+                    size += array.nbytes
+            elif not mapped:
+                size += sys.getsizeof(array) + sum(map(sys.getsizeof, array))
+        return size
+
+    def lookup(self, mode, key):
+        """
+        Returns the row whose `mode` value is `key` as a dict, or None.
+
+        Args:
+            mode (str): One of DISPLAY_MODES.
+            key (str): The value shown in the specimen selector.
+
+        Returns:
+            dict: The Alpha Code, Common Name, Genus and Species of the row.
+        """
+        code = bisect.bisect_left(self._strings, key)
+        if code == len(self._strings) or self._strings[code] != key:
+            return None
+        row = int(self._first_rows[DISPLAY_MODES.index(mode), code])
+        if row < 0:
+            return None
+        return {column: self._value(column, row) for column in self.columns}
+
+    def choices(self, mode):
+        """
+        Returns the distinct values of a display mode in the order of the
+        species list.
+        """
+        return self.search(mode, "", limit=len(self))
+
+    def search(self, mode, query, limit=50):
+        """
+        Returns the distinct values of a display mode whose rows best match a
+        query. The query is matched against the alpha code, common name and
+        binomial of every row and may be partial or misspelled, e.g.
+        "red tail hawk", "RTHA" or "Buteo jam" all find the Red-tailed Hawk.
+        Without a query the values are returned in the order of the list.
+
+        Args:
+            mode (str): One of DISPLAY_MODES.
+            query (str): The text typed in the specimen selector.
+            limit (int): The maximum number of values returned.
+
+        Returns:
+            list: The matching values, best match first.
+        """
+        if query.strip():
+            rows = np.array(self.search_index.search(query), dtype=np.int64)
+        else:
+            rows = np.arange(len(self))
+        position = DISPLAY_MODES.index(mode)
+        codes = self._key_codes[rows, position]
+        # rows sharing a key are only listed once, at their first row
+        listed = codes >= 0
+        listed[listed] = self._first_rows[position, codes[listed]] == rows[listed]
+        return [self._strings[code] for code in codes[listed][:limit].tolist()]
+
+    def _value(self, column, row):
+        is_text, values = self._values[column]
+        if is_text:
+            code = int(values[row])
+            return None if code < 0 else self._strings[code]
+        return values[row].item()
@@ -0,0 +1,191 @@
+import asyncio
+import uuid
+
+import pytz
+
+from . import geo
+from .background import run_in_background
+from .utils import fetch_specimen_classification, get_weather_underground_temperature
+
+# the column holding the id every observation keeps for its lifetime; it is
+# never uploaded or shown
+ROW_ID = "Observation ID"
+
+# placeholders of the fields filled in after an observation is committed
+PENDING = "pending"
+UNAVAILABLE = "unavailable"
+ENRICHED_FIELDS = ["Time observed", "Class", "Order", "Family", "Weather"]
+
+# the SF bay, where the weather is looked up for observations without a location
+DEFAULT_LATITUDE = "37.4803"
+DEFAULT_LONGITUDE = "-122.0786"
+
+
+def new_row_id():
+    """
+    Returns a new, unique observation id.
+    """
+    return uuid.uuid4().hex
+
+
+def local_time(observed_at, latitude, longitude, timezone=None):
+    """
+    Formats the time of an observation in the timezone it was made in, e.g.
+    "10:30 AM".
+
+    Args:
+        observed_at (datetime.datetime): The time the observation was recorded,
+            timezone aware.
+        latitude (str): The latitude of the observation.
+        longitude (str): The longitude of the observation.
+        timezone (str): The timezone of the survey, looked up from the location
+            if None.
+
+    Returns:
+        str: The local time, or UNAVAILABLE if the timezone lookup failed.
+    """
+    try:
+        if timezone is None:
+            timezone = geo.timezone_at(latitude, longitude)
+        return observed_at.astimezone(pytz.timezone(timezone or "UTC")).strftime(
+            "%I:%M %p"
+        )
+    except Exception as e:
+        print(f"Could not look up the local time: {e}")
+        return UNAVAILABLE
+
+
+def observation_location(row):
+    """
+    Returns the coordinates of a recorded observation, or the default location
+    if none was given.
+
+    Args:
+        row (dict): The observation, keyed by column name.
+
+    Returns:
+        tuple: The latitude and longitude, as strings.
+    """
+    latitude, _, longitude = str(row.get("GPS Location") or "").partition(",")
+    try:
+        float(latitude), float(longitude)
+    except ValueError:
+        return DEFAULT_LATITUDE, DEFAULT_LONGITUDE
+    return latitude.strip(), longitude.strip()
+
+
+def enrich_observation(
+    genus, species, common_name, latitude, longitude, observed_at=None, timezone=None
+):
+    """
+    Looks up the fields of an observation that need the network or heavy data:
+    its classification, the weather at its location and its local time. A
+    lookup that fails leaves its fields marked as unavailable instead of
+    failing the others.
+
+    Args:
+        genus (str): The genus of the specimen.
+        species (str): The species of the specimen.
+        common_name (str): The common name of the specimen.
+        latitude (str): The latitude of the observation.
+        longitude (str): The longitude of the observation.
+        observed_at (datetime.datetime): The time the observation was recorded,
+            timezone aware. The time observed is left alone if None.
+        timezone (str): The timezone of the survey, looked up from the location
+            if None.
+
+    Returns:
+        dict: The enriched fields of the observation, keyed by column name.
+    """
+    fields = {}
+    try:
+        results = fetch_specimen_classification(
+            genus=genus, species=species, common_name=common_name
+        )
+        fields.update(
+            {
+                "Class": results["class"],
+                "Order": results["order"],
+                "Family": results["family"],
+            }
+        )
+    except Exception as e:
+        print(f"Could not classify {common_name}: {e}")
+        fields.update({"Class": UNAVAILABLE, "Order": UNAVAILABLE, "Family": UNAVAILABLE})
+
+    try:
+        fields["Weather"] = get_weather_underground_temperature(
+            str(latitude), str(longitude)
+        )
+    except Exception as e:
+        print(f"Could not fetch the weather: {e}")
+        fields["Weather"] = UNAVAILABLE
+
+    if observed_at is not None:
+        fields["Time observed"] = local_time(observed_at, latitude, longitude, timezone)
+    return fields
+
+
+class EnrichmentQueue:
+    """
+    Enriches the observations of one session in the shared background pool so
+    they can be committed without waiting for the network.
+
+    `on_done` is awaited with the row id once the lookup of a row finishes. It
+    is expected to call `take` while holding the reactive lock, so a row is
+    never updated twice even when an upload takes the results first.
+
+    Args:
+        on_done (callable): The coroutine function awaited with the row id.
+    """
+
+    def __init__(self, on_done):
+        self._on_done = on_done
+        self._jobs = {}
+
+    @property
+    def pending(self):
+        """
+        The ids of the rows whose results have not been taken yet.
+        """
+        return list(self._jobs)
+
+    def submit(self, row_id, func, *args, **kwargs):
+        """
+        Runs `func(*args, **kwargs)` in the background pool for a row. Its
+        result is the dict of fields to update.
+        """
+        self.cancel(row_id)
+        job = asyncio.ensure_future(run_in_background(func, *args, **kwargs))
+        self._jobs[row_id] = job
+        job.add_done_callback(
+            lambda _: asyncio.ensure_future(self._on_done(row_id))
+        )
+
+    def take(self, row_id):
+        """
+        Returns the fields looked up for a row and forgets the row, or None if
+        its lookup is still running or was already taken.
+        """
+        job = self._jobs.get(row_id)
+        if job is None or not job.done():
+            return None
+        del self._jobs[row_id]
+        if job.cancelled():
+            return None
+        if job.exception() is not None:
+            print(f"Could not enrich observation {row_id}: {job.exception()}")
+            return dict.fromkeys(ENRICHED_FIELDS, UNAVAILABLE)
+        return job.result()
+
+    def cancel(self, row_id):
+        """
+        Stops waiting for the lookup of a row, e.g. because it was deleted.
+        """
+        job = self._jobs.pop(row_id, None)
+        if job is not None:
+            job.cancel()
+
+    def cancel_all(self):
+        for row_id in self.pending:
+            self.cancel(row_id)
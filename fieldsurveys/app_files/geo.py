@@ -0,0 +1,273 @@
+import threading
+
+import requests
+import reverse_geocoder
+from geopy.adapters import AdapterHTTPError, BaseSyncAdapter
+from geopy.exc import GeocoderParseError, GeocoderTimedOut, GeocoderUnavailable
+from geopy.extra.rate_limiter import RateLimiter
+from geopy.geocoders import Nominatim
+from timezonefinder import TimezoneFinder
+
+from . import http_client
+from .cache import MemoryCache
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+class _HttpClientAdapter(BaseSyncAdapter):
+    # sends the geocoder's requests through the shared http_client, so they use
+    # its pooled connections, retries and timeouts
+    def get_json(self, url, *, timeout, headers):
+        response = self._get(url, timeout=timeout, headers=headers)
+        try:
+            return response.json()
+        except ValueError:
+            raise GeocoderParseError(f"Could not parse the response of {url}")
+
+    def get_text(self, url, *, timeout, headers):
+        return self._get(url, timeout=timeout, headers=headers).text
+
+    def _get(self, url, *, timeout, headers):
+        kwargs = {"headers": headers}
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        try:
+            response = http_client.get(url, **kwargs)
+        except requests.Timeout:
+            raise GeocoderTimedOut("Service timed out")
+        except requests.RequestException as e:
+            raise GeocoderUnavailable(str(e))
+        if response.status_code >= 400:
+            raise AdapterHTTPError(
+                f"Non-successful status code {response.status_code}",
+                status_code=response.status_code,
+                headers=response.headers,
+                text=response.text,
+            )
+        return response
+
+
+# instantiate a Nominatim geocoder; its usage policy allows one request per
+# second. Without a timeout of its own, the http client's one applies.
+geolocator = Nominatim(
+    user_agent="temp_shiny_app", timeout=None, adapter_factory=_HttpClientAdapter
+)
+_reverse = RateLimiter(
+    geolocator.reverse, min_delay_seconds=1, max_retries=0, swallow_exceptions=False
+)
+
+# places resolved per geohash cell, shared by every session; precision 6 cells
+# are about 1.2 km x 0.6 km
+geocode_precision = 6
+geocode_cache = MemoryCache(ttl=30 * 24 * 60 * 60, max_entries=10000)
+
+# "online" asks Nominatim; "offline" resolves places from the GeoNames table of
+# cities with more than 1000 inhabitants bundled with reverse_geocoder
+geocode_mode = "online"
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+# the timezone polygons are loaded once per process; lookups are memoized per
+# geohash cell, precision 6 cells are small enough to rarely straddle a border
+timezone_precision = 6
+timezone_cache = MemoryCache(ttl=365 * 24 * 60 * 60, max_entries=10000)
+_timezone_finder = None
+_timezone_lock = threading.Lock()
+
+
+def geohash(latitude, longitude, precision=6):
+    """
+    Encodes a coordinate as a geohash, the name of the grid cell containing it.
+
+    Args:
+        latitude (float): The latitude in degrees.
+        longitude (float): The longitude in degrees.
+        precision (int): The number of characters; every extra character makes
+            the cell roughly 32 times smaller.
+
+    Returns:
+        str: The geohash of the cell.
+    """
+    latitude_range = [-90.0, 90.0]
+    longitude_range = [-180.0, 180.0]
+    characters = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(characters) < precision:
+        value, bounds = (
+            (longitude, longitude_range) if even else (latitude, latitude_range)
+        )
+        middle = (bounds[0] + bounds[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            characters.append(_GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(characters)
+
+
+def configure_geocoder(
+    precision=6, ttl=30 * 24 * 60 * 60, max_entries=10000, mode="online"
+):
+    """
+    Sets the geohash precision of the reverse-geocode cache and replaces it.
+    In offline mode the gazetteer is loaded right away so the first
+    observation does not pay for it.
+
+    Args:
+        precision (int): The geohash precision observations are grouped by.
+        ttl (float): The number of seconds a resolved place stays valid.
+        max_entries (int): The maximum number of cells kept.
+        mode (str): "online" to use Nominatim or "offline" to use the gazetteer.
+    """
+    global geocode_precision, geocode_cache, geocode_mode
+    if mode not in ("online", "offline"):
+        raise ValueError(f"Unknown geocode mode: {mode}")
+    geocode_precision = precision
+    geocode_cache = MemoryCache(ttl=ttl, max_entries=max_entries)
+    geocode_mode = mode
+    if mode == "offline":
+        load_gazetteer()
+
+
+def load_gazetteer():
+    """
+    Loads the gazetteer and builds its KD-tree, once per process.
+
+    Returns:
+        reverse_geocoder.RGeocoder: The gazetteer.
+    """
+    global _gazetteer
+    with _gazetteer_lock:
+        if _gazetteer is None:
+            _gazetteer = reverse_geocoder.RGeocoder(mode=1, verbose=False)
+    return _gazetteer
+
+
+def reverse_geocode(latitude, longitude):
+    """
+    Resolves the country code, state and city of a coordinate. Coordinates in
+    the same geohash cell share one Nominatim lookup.
+
+    Args:
+        latitude (float): The latitude in degrees.
+        longitude (float): The longitude in degrees.
+
+    Returns:
+        dict: The `country_code`, `state` and `city` of the place.
+    """
+    if geocode_mode == "offline":
+        return reverse_geocode_many([(latitude, longitude)])[0]
+
+    cell = geohash(float(latitude), float(longitude), geocode_precision)
+    place = geocode_cache.get(cell)
+    if place is None:
+        location = _reverse(f"{latitude},{longitude}")
+        address = location.raw["address"]
+        place = {
+            "country_code": address.get("country_code", ""),
+            "state": address.get("state", ""),
+            "city": address.get(
+                "city", address.get("village", address.get("hamlet", ""))
+            ),
+        }
+        geocode_cache.set(cell, place)
+    return place
+
+
+def reverse_geocode_many(coordinates):
+    """
+    Resolves many coordinates at once. In offline mode the nearest gazetteer
+    places are found with a single KD-tree query; online, every coordinate is
+    looked up with `reverse_geocode`.
+
+    Args:
+        coordinates (list): (latitude, longitude) pairs.
+
+    Returns:
+        list: The `country_code`, `state` and `city` of every place, in order.
+    """
+    coordinates = [(float(latitude), float(longitude)) for latitude, longitude in coordinates]
+    if not coordinates:
+        return []
+    if geocode_mode != "offline":
+        return [reverse_geocode(latitude, longitude) for latitude, longitude in coordinates]
+    return [
+        {
+            "country_code": location["cc"].lower(),
+            "state": location["admin1"],
+            "city": location["name"],
+        }
+        for location in load_gazetteer().query(coordinates)
+    ]
+
+
+def configure_timezone_finder(precision=6, in_memory=False, max_entries=10000):
+    """
+    Loads the timezone polygons and replaces the timezone cache.
+
+    Args:
+        precision (int): The geohash precision timezones are memoized by.
+        in_memory (bool): Whether to read the polygon data into memory instead
+            of reading it from the memory-mapped data files.
+        max_entries (int): The maximum number of cells kept.
+    """
+    global timezone_precision, timezone_cache, _timezone_finder
+    with _timezone_lock:
+        _timezone_finder = TimezoneFinder(in_memory=in_memory)
+    timezone_precision = precision
+    timezone_cache = MemoryCache(ttl=365 * 24 * 60 * 60, max_entries=max_entries)
+
+
+def timezone_at(latitude, longitude):
+    """
+    Returns the name of the timezone of a coordinate, e.g. "America/Los_Angeles",
+    or None if it is not certain, e.g. at sea.
+
+    Args:
+        latitude (float): The latitude in degrees.
+        longitude (float): The longitude in degrees.
+
+    Returns:
+        str: The timezone name.
+    """
+    return timezones_at([(latitude, longitude)])[0]
+
+
+def timezones_at(coordinates):
+    """
+    Returns the timezone of many coordinates, looking up every geohash cell
+    among them only once.
+
+    Args:
+        coordinates (list): (latitude, longitude) pairs.
+
+    Returns:
+        list: The timezone name of every coordinate, in order.
+    """
+    global _timezone_finder
+    coordinates = [(float(latitude), float(longitude)) for latitude, longitude in coordinates]
+    cells = [geohash(latitude, longitude, timezone_precision) for latitude, longitude in coordinates]
+    timezones = {}
+    for cell, (latitude, longitude) in zip(cells, coordinates):
+        if cell in timezones:
+            continue
+        # an empty string stands for a lookup without a certain answer
+        timezone = timezone_cache.get(cell)
+        if timezone is None:
+            # TimezoneFinder reads its data files through shared handles
+            with _timezone_lock:
+                if _timezone_finder is None:
+                    _timezone_finder = TimezoneFinder()
+                timezone = _timezone_finder.certain_timezone_at(lng=longitude, lat=latitude) or ""
+            timezone_cache.set(cell, timezone)
+        timezones[cell] = timezone
+    return [timezones[cell] or None for cell in cells]
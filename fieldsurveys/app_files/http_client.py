@@ -0,0 +1,115 @@
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class HttpClient:
+    """
+    A pooled HTTP client shared by all outbound calls of the app.
+
+    Connections are kept alive and reused per host, every request gets a
+    timeout, idempotent requests are retried with exponential backoff on
+    connection errors and 429/5xx responses, and at most
+    `max_concurrency_per_host` requests are in flight to any single host.
+
+    Args:
+        timeout (float): The default (connect and read) timeout in seconds.
+        host_timeouts (dict): Per-host timeouts in seconds, overriding the default.
+        retries (int): The number of retries for failed GET requests.
+        backoff_factor (float): The backoff factor between retries, in seconds.
+        pool_maxsize (int): The number of connections kept alive per host.
+        max_concurrency_per_host (int): The number of concurrent requests allowed per host.
+    """
+
+    def __init__(
+        self,
+        timeout=15,
+        host_timeouts=None,
+        retries=2,
+        backoff_factor=0.5,
+        pool_maxsize=10,
+        max_concurrency_per_host=4,
+    ):
+        self.timeout = timeout
+        self.host_timeouts = dict(host_timeouts or {})
+        self.max_concurrency_per_host = max_concurrency_per_host
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_maxsize,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry,
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        host = urlsplit(url).hostname or ""
+        kwargs.setdefault("timeout", self.host_timeouts.get(host, self.timeout))
+        with self._semaphore(host):
+            return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def _semaphore(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(
+                    self.max_concurrency_per_host
+                )
+            return self._semaphores[host]
+
+
+client = HttpClient()
+
+
+def configure_http_client(http_config):
+    """
+    Replaces the shared client with one configured from the `http` section of
+    survey.yaml.
+
+    Args:
+        http_config (dict): The optional `timeout_seconds`, `host_timeout_seconds`,
+            `retries`, `backoff_seconds`, `connections_per_host` and
+            `max_concurrency_per_host` settings.
+
+    Returns:
+        HttpClient: The newly configured client.
+    """
+    global client
+    client = HttpClient(
+        timeout=float(http_config.get("timeout_seconds", 15)),
+        host_timeouts={
+            host: float(timeout)
+            for host, timeout in (http_config.get("host_timeout_seconds") or {}).items()
+        },
+        retries=int(http_config.get("retries", 2)),
+        backoff_factor=float(http_config.get("backoff_seconds", 0.5)),
+        pool_maxsize=int(http_config.get("connections_per_host", 10)),
+        max_concurrency_per_host=int(http_config.get("max_concurrency_per_host", 4)),
+    )
+    return client
+
+
+def get(url, **kwargs):
+    return client.get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    return client.post(url, **kwargs)
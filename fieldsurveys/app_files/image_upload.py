@@ -1,9 +1,10 @@
-import requests
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
 import time
 
+from . import http_client
+
 
 def upload_image_to_imgur(survey_config, image_path):
     client_id = survey_config["imgur_app_id"]
@@ -18,7 +19,7 @@ def upload_image_to_imgur(survey_config, image_path):
         files = {"image": file}
         data = {"type": "file"}
 
-        response = requests.post(api_url, headers=headers, files=files, data=data)
+        response = http_client.post(api_url, headers=headers, files=files, data=data)
 
         # Check if the request was successful
         if response.status_code == 200:
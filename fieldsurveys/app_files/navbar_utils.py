@@ -9,6 +9,57 @@ woman_on_smartphone = ui.tags.img(src="https://gilded-mandazi-30bb2e.netlify.app
 woman_reminding = ui.tags.img(src="https://gilded-mandazi-30bb2e.netlify.app/woman_reminding.svg")
 
 
+def specimen_selector(survey_config):
+    if not (survey_config.get("specimen_search") or {}).get("server", True):
+        return ui.input_selectize(
+            "specimen", label="Select the specimen observed", choices={}
+        )
+    # the server ranks matches that may not contain the typed text (typos, alpha
+    # codes), so show its results in its order instead of filtering them again
+    return ui.TagList(
+        ui.input_selectize(
+            "specimen",
+            label="Select the specimen observed",
+            choices={},
+            options={
+                "score": ui.js_eval(
+                    """
+                    function (query) {
+                        var ranks = window.specimenRanks[$.trim(query)] || {};
+                        return function (item) { return ranks[item.value] || 0; };
+                    }
+                    """
+                ),
+            },
+        ),
+        ui.tags.script(
+            """
+            window.specimenRanks = {};
+            $.ajaxPrefilter(function (options, originalOptions) {
+                if (options.url.indexOf("dynamic_route/specimen_choices") === -1) {
+                    return;
+                }
+                var query = $.trim(originalOptions.data.query);
+                var success = options.success;
+                options.success = function (results) {
+                    var ranks = {};
+                    results.forEach(function (result, i) {
+                        ranks[result.value] = results.length - i;
+                    });
+                    window.specimenRanks[query] = ranks;
+                    success.apply(this, arguments);
+                    // selectize already scored the query before its ranks arrived
+                    // and only rescores it for options it has not seen before
+                    var selectize = $("#specimen")[0].selectize;
+                    selectize.lastQuery = null;
+                    selectize.refreshOptions(false);
+                };
+            });
+            """
+        ),
+    )
+
+
 def record_observation(survey_config):
     return ui.nav_panel(
         "Record observation",
@@ -32,7 +83,7 @@ def record_observation(survey_config):
                                 False,
                             ),
                             "Enable this mode to reduce your data usage.💰 ",
-                            "It won't load images and trivia about specimen when turned on",
+                            "It only loads small pictures of the specimen, without trivia, when turned on",
                             placement="top",
                             id="low_data_mode_tooltip",
                         ),
@@ -130,9 +181,7 @@ def record_observation(survey_config):
                             "Show Genus + Species instead of Common Name",
                             False,
                         ),
-                        ui.input_selectize(
-                            "specimen", label="Select the specimen observed", choices={}
-                        ),
+                        specimen_selector(survey_config),
                         ui.input_selectize(
                             "count",
                             label="Count observed",
@@ -218,6 +267,26 @@ def record_observation(survey_config):
     )
 
 
+def observations_pager_controls():
+    # shown under the observations grid once there is more than one page
+    return ui.layout_columns(
+        ui.input_action_button(
+            "previous_observations",
+            "",
+            icon=icon_svg("chevron-left"),
+            class_="btn btn-outline-secondary",
+        ),
+        ui.output_text("observations_page"),
+        ui.input_action_button(
+            "next_observations",
+            "",
+            icon=icon_svg("chevron-right"),
+            class_="btn btn-outline-secondary",
+        ),
+        col_widths=[2, 8, 2],
+    )
+
+
 def verify_observation(survey_config, keyfile_path):
     return (
         ui.nav_panel(
@@ -258,6 +327,7 @@ def verify_observation(survey_config, keyfile_path):
                     "input.isWide",
                     ui.TagList(
                         ui.output_data_frame("observations_data_frame"),
+                        ui.output_ui("observations_pager"),
                         ui.br(),
                         ui.br(),
                         ui.tooltip(
@@ -274,7 +344,16 @@ def verify_observation(survey_config, keyfile_path):
                     ),
                 ),
                 ui.panel_conditional(
-                    "!input.isWide", ui.output_ui("observations_list")
+                    "!input.isWide",
+                    # the cards are inserted and removed one by one by the server
+                    ui.div(id="observations_list"),
+                    ui.tags.script(
+                        """
+                        $(document).on("click", "#observations_list [data-row-id]", function() {
+                            Shiny.setInputValue("delete_row", this.dataset.rowId, {priority: "event"});
+                        });
+                        """
+                    ),
                 ),
             ),
             ui.page_fluid(
@@ -337,11 +416,127 @@ def verify_observation(survey_config, keyfile_path):
                     ),
                     ui.tags.script(
                         """
+                        // the observations of the session are kept as a journal of
+                        // changes in IndexedDB, replayed to restore them
+                        const observationJournal = (function () {
+                            const STORE = "journal";
+                            // entries written before the journal is compacted
+                            const COMPACT_AFTER = 100;
+                            let written = 0;
+                            let database = null;
+                            let tail = Promise.resolve();
+
+                            function request(target) {
+                                return new Promise(function (resolve, reject) {
+                                    target.onsuccess = function () { resolve(target.result); };
+                                    target.onerror = function () { reject(target.error); };
+                                });
+                            }
+
+                            function write(db, entries, clear) {
+                                return new Promise(function (resolve, reject) {
+                                    const transaction = db.transaction(STORE, "readwrite");
+                                    const store = transaction.objectStore(STORE);
+                                    if (clear) {
+                                        store.clear();
+                                    }
+                                    entries.forEach(function (entry) { store.add(entry); });
+                                    transaction.oncomplete = function () { resolve(db); };
+                                    transaction.onerror = transaction.onabort = function () {
+                                        reject(transaction.error);
+                                    };
+                                });
+                            }
+
+                            function readRows(db) {
+                                const store = db.transaction(STORE).objectStore(STORE);
+                                return request(store.getAll()).then(function (entries) {
+                                    const rows = new Map();
+                                    entries.forEach(function (entry) {
+                                        if (entry.op === "append") {
+                                            rows.set(entry.id, entry.row);
+                                        } else if (entry.op === "update" && rows.has(entry.id)) {
+                                            Object.assign(rows.get(entry.id), entry.fields);
+                                        } else if (entry.op === "delete") {
+                                            rows.delete(entry.id);
+                                        } else if (entry.op === "clear") {
+                                            rows.clear();
+                                        }
+                                    });
+                                    return rows;
+                                });
+                            }
+
+                            function compact(db) {
+                                // replaces the journal by one append per remaining row
+                                return readRows(db).then(function (rows) {
+                                    const entries = [];
+                                    rows.forEach(function (row, id) {
+                                        entries.push({op: "append", id: id, row: row});
+                                    });
+                                    return write(db, entries, true);
+                                });
+                            }
+
+                            function migrate(db) {
+                                // observations saved in localStorage before the journal
+                                const saved = localStorage.getItem("df");
+                                if (saved === null) {
+                                    return db;
+                                }
+                                const entries = JSON.parse(saved).map(function (row, index) {
+                                    return {op: "append", id: "legacy-" + index, row: row};
+                                });
+                                return write(db, entries, true).then(function () {
+                                    localStorage.removeItem("df");
+                                    return db;
+                                });
+                            }
+
+                            function run(task) {
+                                if (database === null) {
+                                    const open = indexedDB.open("fieldsurveys", 1);
+                                    open.onupgradeneeded = function () {
+                                        open.result.createObjectStore(STORE, {autoIncrement: true});
+                                    };
+                                    database = request(open).then(migrate);
+                                }
+                                // one task at a time, in the order the changes were made
+                                const result = tail.then(function () { return database; }).then(task);
+                                tail = result.catch(function (error) {
+                                    console.error("Could not update the observation journal", error);
+                                });
+                                return result;
+                            }
+
+                            return {
+                                append: function (entries) {
+                                    return run(function (db) {
+                                        written += entries.length;
+                                        return write(db, entries, false).then(function () {
+                                            if (written < COMPACT_AFTER) {
+                                                return;
+                                            }
+                                            written = 0;
+                                            return compact(db);
+                                        });
+                                    });
+                                },
+                                rows: function () {
+                                    return run(readRows).then(function (rows) {
+                                        return Array.from(rows.values());
+                                    });
+                                },
+                            };
+                        })();
+
                         $(document).ready(function () {
                         Shiny.addCustomMessageHandler("restore", function (message) {
 
                             if (message === "restore") {
-                                Shiny.setInputValue("restore_df", localStorage.getItem("df"));
+                                observationJournal.rows().then(function (rows) {
+                                    Shiny.setInputValue("restore_df", rows.length ? JSON.stringify(rows) : null);
+                                });
                             } else if (message === "complete") {
                                 Shiny.setInputValue("restore_df", null);
                                 }
@@ -349,18 +544,8 @@ def verify_observation(survey_config, keyfile_path):
                         });
                         
 
-                        Shiny.addCustomMessageHandler("df", function (message) {
-                            localStorage.setItem("df", message);
-                            Shiny.setInputValue("local_storage_df", localStorage.getItem("df"));
-                        });
-
-
-                        Shiny.addCustomMessageHandler("clear", function (message) {
-                            if (message === "clear") {
-                            console.log("clear the store");
-                                localStorage.removeItem("df");
-                                return;
-                            }
+                        Shiny.addCustomMessageHandler("journal", function (entries) {
+                            observationJournal.append(entries);
                         });
                         });
                     """
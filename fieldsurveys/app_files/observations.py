@@ -0,0 +1,206 @@
+import pandas as pd
+
+from .enrichment import ROW_ID
+
+
+class ObservationStore:
+    """
+    The observations of one session, kept column by column.
+
+    Appending a row adds one value to every column list and deleting a row only
+    marks it as deleted, so neither copies the rows already recorded. Deleted
+    rows are dropped for good once they make up half of the store. Rows are
+    addressed by their id (the ROW_ID column), which never changes, rather than
+    by their position. `version` is incremented on every change and every row
+    remembers the version it last changed in (`row_version`), so views of the
+    rows can be updated one row at a time. A DataFrame is only built by
+    `to_frame`, once per version.
+
+    Every change is also recorded as a journal entry, a small JSON
+    serializable dict, until `take_changes` is called: {"op": "append", "id",
+    "row"}, {"op": "update", "id", "fields"}, {"op": "delete", "id"} or
+    {"op": "clear"}. Replaying the entries in order gives the same rows. The
+    first entries of a store start with a clear, so a journal kept from an
+    earlier session is emptied rather than added to; the clear is only handed
+    out with the first change, which leaves the earlier rows to be restored
+    until then.
+
+    Args:
+        columns (list): The columns every row has, in order. Columns of rows
+            that are not listed are added after them.
+    """
+
+    def __init__(self, columns=()):
+        self.version = 0
+        self._columns = {column: [] for column in columns}
+        if ROW_ID not in self._columns:
+            self._columns[ROW_ID] = []
+        # position of every row id in the column lists, deleted rows included
+        self._positions = {}
+        self._deleted = set()
+        self._row_versions = {}
+        self._changes = [{"op": "clear"}]
+        self._frame = None
+        self._frame_version = None
+
+    def __len__(self):
+        return len(self._positions) - len(self._deleted)
+
+    def __contains__(self, row_id):
+        position = self._positions.get(row_id)
+        return position is not None and position not in self._deleted
+
+    def append(self, fields):
+        """
+        Adds a row.
+
+        Args:
+            fields (dict): The values of the row, keyed by column name. It must
+                hold a new row id under ROW_ID; missing columns are left empty.
+        """
+        row_id = fields[ROW_ID]
+        if row_id in self._positions:
+            raise ValueError(f"Duplicate observation id: {row_id}")
+        size = len(self._positions)
+        for column in fields:
+            if column not in self._columns:
+                self._columns[column] = [None] * size
+        for column, values in self._columns.items():
+            values.append(fields.get(column))
+        self._positions[row_id] = size
+        self.version += 1
+        self._row_versions[row_id] = self.version
+        self._changes.append({"op": "append", "id": row_id, "row": dict(fields)})
+
+    def extend(self, records):
+        """
+        Adds several rows, see `append`.
+        """
+        for fields in records:
+            self.append(fields)
+
+    def update(self, row_id, fields):
+        """
+        Replaces fields of a row. Rows that were deleted are left alone.
+
+        Args:
+            row_id (str): The id of the row.
+            fields (dict): The new values, keyed by column name.
+        """
+        if row_id not in self:
+            return
+        position = self._positions[row_id]
+        size = len(self._positions)
+        for column, value in fields.items():
+            if column not in self._columns:
+                self._columns[column] = [None] * size
+            self._columns[column][position] = value
+        self.version += 1
+        self._row_versions[row_id] = self.version
+        self._changes.append({"op": "update", "id": row_id, "fields": dict(fields)})
+
+    def delete(self, row_id):
+        """
+        Removes a row, if it is still there.
+        """
+        if row_id not in self:
+            return
+        self._deleted.add(self._positions[row_id])
+        del self._row_versions[row_id]
+        self.version += 1
+        self._changes.append({"op": "delete", "id": row_id})
+        if len(self._deleted) * 2 > len(self._positions):
+            self._compact()
+
+    def clear(self):
+        for values in self._columns.values():
+            values.clear()
+        self._positions.clear()
+        self._deleted.clear()
+        self._row_versions.clear()
+        self.version += 1
+        self._changes = [{"op": "clear"}]
+
+    def take_changes(self):
+        """
+        Returns the journal entries of the changes made since the last call.
+        """
+        if not self.version:
+            # nothing changed yet, the clear a store starts with is held back
+            return []
+        changes, self._changes = self._changes, []
+        return changes
+
+    def get(self, row_id):
+        """
+        Returns the values of a row as a dict, or None if there is no such row.
+        """
+        if row_id not in self:
+            return None
+        position = self._positions[row_id]
+        return {column: values[position] for column, values in self._columns.items()}
+
+    def row_version(self, row_id):
+        """
+        Returns the version in which a row was added or last updated.
+        """
+        return self._row_versions[row_id]
+
+    def row_ids(self):
+        """
+        Returns the ids of the rows, in the order they were added.
+        """
+        return [
+            row_id
+            for row_id, position in self._positions.items()
+            if position not in self._deleted
+        ]
+
+    def to_frame(self):
+        """
+        Returns the rows as a DataFrame numbered from 0, in the order they were
+        added. The frame is shared by the callers of the same version, so it
+        must not be modified.
+        """
+        if self._frame_version != self.version:
+            if self._deleted:
+                self._compact()
+            self._frame = pd.DataFrame(
+                {column: list(values) for column, values in self._columns.items()},
+                columns=list(self._columns),
+            )
+            self._frame_version = self.version
+        return self._frame
+
+    def _compact(self):
+        # drops the deleted rows; positions change but row ids and the version
+        # do not, since the rows are the same
+        kept = sorted(set(self._positions.values()) - self._deleted)
+        for column, values in self._columns.items():
+            self._columns[column] = [values[position] for position in kept]
+        self._positions = {
+            row_id: new_position
+            for new_position, row_id in enumerate(self._columns[ROW_ID])
+        }
+        self._deleted.clear()
+
+
+def grid_window(df, columns, page, page_size):
+    """
+    Returns a page of observations as the observations grid shows it.
+
+    Args:
+        df (pandas.DataFrame): The observations, see ObservationStore.to_frame.
+        columns (list): The columns shown.
+        page (int): The page asked for, from 0. Past the last page, the last
+            one is shown.
+        page_size (int): The number of rows per page.
+
+    Returns:
+        tuple: The page shown, the ids of its rows and its rows numbered from
+            0, so the row selected in the grid is found by its number.
+    """
+    last_page = max(0, (len(df) - 1) // page_size)
+    page = max(0, min(page, last_page))
+    window = df.iloc[page * page_size : (page + 1) * page_size]
+    return page, list(window[ROW_ID]), window[columns].reset_index(drop=True)
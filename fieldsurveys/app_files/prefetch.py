@@ -0,0 +1,108 @@
+import asyncio
+
+from .background import run_in_low_priority
+from .utils import (
+    fetch_specimen_classification,
+    get_summaries_for_specimens,
+)
+
+UNKNOWN_VALUES = ["unknown", "Unknown", "UNKOWN", "None", "other"]
+
+# the prefetches of every session share one rate limit, see configure_prefetch
+requests_per_second = 1.0
+# the event loop time the next lookup may start at
+_next_turn = 0.0
+
+
+def configure_prefetch(prefetch_config):
+    """
+    Sets the maximum rate of prefetch lookups, shared by every session, from
+    the `prefetch` section of survey.yaml.
+
+    Args:
+        prefetch_config (dict): The optional `requests_per_second` setting.
+    """
+    global requests_per_second
+    requests_per_second = float(prefetch_config.get("requests_per_second", 1))
+
+
+def select_prefetch_species(df, data_source, prefetch_config):
+    """
+    Picks the rows of a data source whose notes are worth warming up.
+
+    Species listed for the data source under `prefetch.species` in survey.yaml
+    come first, in the order they are listed (by common name or alpha code).
+    Without such a list the first rows of the CSV are used. Either way at most
+    `prefetch.top_n` rows are returned, and rows with an unknown genus are skipped
+    since the notes panel is not shown for them.
+
+    Args:
+        df (pandas.DataFrame): The data source.
+        data_source (str): The name of the data source.
+        prefetch_config (dict): The `prefetch` section of survey.yaml.
+
+    Returns:
+        list: Dicts with the Genus, Species and Common Name of every row to warm up.
+    """
+    top_n = int(prefetch_config.get("top_n", 25))
+    df = df[~df["Genus"].isin(UNKNOWN_VALUES)]
+    frequent = (prefetch_config.get("species") or {}).get(data_source)
+    if frequent:
+        rank = {name: index for index, name in enumerate(frequent)}
+        ranks = df["Common Name"].map(rank).fillna(df["Alpha Code"].map(rank))
+        df = df.assign(_rank=ranks).dropna(subset=["_rank"]).sort_values("_rank")
+    rows = df.head(top_n)[["Genus", "Species", "Common Name"]]
+    return rows.to_dict("records")
+
+
+async def prefetch_species_notes(species, thumbnail_cache, low_data_mode):
+    """
+    Warms the summary, image and taxonomy caches for a list of species in the
+    low priority pool. Lookups wait for their turn under the rate limit every
+    session shares (see `configure_prefetch`), so several sessions prefetching
+    at once do not multiply the load on the APIs. Cancelling the task stops it
+    before the next lookup.
+
+    Summaries are skipped in Bandwidth Saver mode since the notes panel does
+    not show them then.
+
+    Args:
+        species (list): Dicts with the Genus, Species and Common Name of every row.
+        thumbnail_cache (ThumbnailCache): The cache serving the species photos.
+        low_data_mode (bool): Whether Bandwidth Saver is turned on.
+    """
+    if not low_data_mode:
+        titles = [f"{row['Genus']} {row['Species']}" for row in species]
+        for start in range(0, len(titles), 20):
+            await _wait_turn()
+            await _warm(get_summaries_for_specimens, titles[start : start + 20])
+
+    for row in species:
+        genus, species_name = row["Genus"], row["Species"]
+        image_species = "" if species_name in UNKNOWN_VALUES else species_name
+        await _wait_turn()
+        await _warm(thumbnail_cache.get_species_variants, genus, image_species)
+        await _wait_turn()
+        await _warm(
+            fetch_specimen_classification,
+            genus=genus,
+            species=species_name,
+            common_name=row["Common Name"],
+        )
+
+
+async def _wait_turn():
+    # takes the next free slot before sleeping; the sessions all run on the
+    # event loop, so no lock is needed
+    global _next_turn
+    now = asyncio.get_running_loop().time()
+    turn = max(now, _next_turn)
+    _next_turn = turn + 1 / requests_per_second
+    await asyncio.sleep(turn - now)
+
+
+async def _warm(func, *args, **kwargs):
+    try:
+        await run_in_low_priority(func, *args, **kwargs)
+    except Exception as e:
+        print(f"Prefetching notes failed: {e}")
@@ -0,0 +1,178 @@
+import bisect
+import re
+from collections import defaultdict
+
+import numpy as np
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# the score of a query word matching a word of a row exactly; prefix and fuzzy
+# matches score less, see SearchIndex._matching_tokens
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.6
+FUZZY_SCORE = 0.5
+# the share of trigrams two words need in common to count as a typo of each other
+MIN_SIMILARITY = 0.45
+
+
+def tokenize(text):
+    """
+    Splits text into lower case words, dropping punctuation.
+    """
+    return _TOKEN.findall(str(text).lower())
+
+
+def trigrams(token):
+    """
+    Returns the three letter sequences of a word, padded so that its first and
+    last letters count too.
+    """
+    padded = f"  {token} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """
+    Ranks rows of text against a query that may be partial or misspelled.
+
+    Every distinct word is kept in a sorted array, so the words starting with a
+    query word are found with a binary search, and in a trigram index, so words
+    that are spelled similarly are found without comparing the query with every
+    word. Each row is scored by the number of query words it matches and by how
+    well they match: exactly, as a prefix, or as a likely typo.
+
+    Args:
+        documents (list): The text of every row.
+    """
+
+    def __init__(self, documents=()):
+        postings = defaultdict(set)
+        self._lengths = []
+        for row, text in enumerate(documents):
+            tokens = tokenize(text)
+            self._lengths.append(len(tokens))
+            for token in tokens:
+                postings[token].add(row)
+        self._tokens = sorted(postings)
+        self._trigram_counts = []
+        token_trigrams = defaultdict(list)
+        for token_id, token in enumerate(self._tokens):
+            trigram_set = trigrams(token)
+            self._trigram_counts.append(len(trigram_set))
+            for trigram in trigram_set:
+                token_trigrams[trigram].append(token_id)
+        self._lengths = np.array(self._lengths, dtype=np.int32)
+        self._trigram_counts = np.array(self._trigram_counts, dtype=np.int32)
+        # the rows of every word and the words of every trigram are kept flat,
+        # one array of values and one of where the values of each word start,
+        # so they are stored and loaded as they are, see to_arrays
+        self._postings, self._posting_offsets = _flatten(
+            [sorted(postings[token]) for token in self._tokens]
+        )
+        self._trigrams = sorted(token_trigrams)
+        self._trigram_tokens, self._trigram_offsets = _flatten(
+            [token_trigrams[trigram] for trigram in self._trigrams]
+        )
+
+    def to_arrays(self):
+        """
+        Returns the index as flat arrays that `from_arrays` restores it from.
+        The words and trigrams are returned as sorted sequences of strings.
+        """
+        return {
+            "tokens": self._tokens,
+            "trigrams": self._trigrams,
+            "lengths": self._lengths,
+            "trigram_counts": self._trigram_counts,
+            "postings": self._postings,
+            "posting_offsets": self._posting_offsets,
+            "trigram_tokens": self._trigram_tokens,
+            "trigram_offsets": self._trigram_offsets,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """
+        Restores an index from the arrays returned by `to_arrays`. They are used
+        as they are, so memory-mapped arrays, and sequences of strings that are
+        decoded as they are read, stay on disk until a search reads them.
+        """
+        index = cls()
+        for name, array in arrays.items():
+            setattr(index, f"_{name}", array)
+        return index
+
+    def search(self, query):
+        """
+        Returns the rows matching a query, best match first. Of the rows that
+        score the same, shorter rows come first, since less of them is left
+        unmatched, then rows keep their order.
+
+        Args:
+            query (str): The text to search for.
+
+        Returns:
+            list: The row numbers of the matching rows.
+        """
+        scores = defaultdict(float)
+        matched = defaultdict(int)
+        for query_token in dict.fromkeys(tokenize(query)):
+            best = {}
+            for token_id, score in self._matching_tokens(query_token).items():
+                start, end = self._posting_offsets[token_id : token_id + 2]
+                for row in self._postings[start:end].tolist():
+                    if score > best.get(row, 0):
+                        best[row] = score
+            for row, score in best.items():
+                scores[row] += score
+                matched[row] += 1
+        return sorted(
+            scores,
+            key=lambda row: (-matched[row], -scores[row], int(self._lengths[row]), row),
+        )
+
+    def _matching_tokens(self, query_token):
+        matches = {}
+        start = bisect.bisect_left(self._tokens, query_token)
+        for token_id in range(start, len(self._tokens)):
+            token = self._tokens[token_id]
+            if not token.startswith(query_token):
+                break
+            if token == query_token:
+                matches[token_id] = EXACT_SCORE
+            else:
+                # the more of the word is typed, the better the match
+                matches[token_id] = PREFIX_SCORE + 0.3 * len(query_token) / len(token)
+
+        if len(query_token) >= 3:
+            query_trigrams = trigrams(query_token)
+            shared = defaultdict(int)
+            for trigram in query_trigrams:
+                trigram_id = bisect.bisect_left(self._trigrams, trigram)
+                if (
+                    trigram_id == len(self._trigrams)
+                    or self._trigrams[trigram_id] != trigram
+                ):
+                    continue
+                start, end = self._trigram_offsets[trigram_id : trigram_id + 2]
+                for token_id in self._trigram_tokens[start:end].tolist():
+                    shared[token_id] += 1
+            for token_id, count in shared.items():
+                if token_id in matches:
+                    continue
+                similarity = (
+                    2
+                    * count
+                    / (len(query_trigrams) + int(self._trigram_counts[token_id]))
+                )
+                if similarity >= MIN_SIMILARITY:
+                    matches[token_id] = FUZZY_SCORE * similarity
+        return matches
+
+
+def _flatten(lists):
+    # a list of lists as one array of values and one of where each list starts
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(values) for values in lists])
+    values = np.array([value for values in lists for value in values], dtype=np.int32)
+    return values, offsets
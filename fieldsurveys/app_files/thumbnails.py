@@ -0,0 +1,125 @@
+import hashlib
+import io
+import os
+import threading
+
+from PIL import Image
+
+from . import http_client
+from .cache import PersistentCache
+from .utils import get_species_images
+
+# the longest side, in pixels, of every variant kept for a species photo
+THUMBNAIL_SIZES = {"small": 240, "medium": 640, "large": 1280}
+
+
+def remote_variants(image_url):
+    """
+    Returns variants that all point at the original image, for when an image
+    could not be cached locally.
+    """
+    return {size: image_url for size in THUMBNAIL_SIZES}
+
+
+class ThumbnailCache:
+    """
+    Downloads species photos once and keeps downscaled JPEG variants of them in
+    a content-addressed directory that the app serves as static assets.
+
+    Args:
+        directory (str): The directory the variants are written to.
+        index_path (str): The SQLite file mapping source URLs to cached images.
+            It is kept outside `directory` so it is not served.
+        url_prefix (str): The URL path the directory is mounted at.
+        quality (int): The JPEG quality used when recompressing the variants.
+        max_entries (int): The maximum number of source images remembered.
+    """
+
+    def __init__(
+        self,
+        directory,
+        index_path,
+        url_prefix="/thumbnails",
+        quality=70,
+        max_entries=5000,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.url_prefix = url_prefix.rstrip("/")
+        self.quality = quality
+        # maps a source image URL to the digest of its content
+        self._index = PersistentCache(
+            index_path,
+            ttl=365 * 24 * 60 * 60,
+            max_entries=max_entries,
+        )
+        # striped locks so concurrent requests for one image download it once
+        self._locks = [threading.Lock() for _ in range(64)]
+
+    def get_variants(self, image_url):
+        """
+        Returns the URLs of the local variants of an image, downloading and
+        downscaling it first if it is not cached yet.
+
+        Args:
+            image_url (str): The URL of the source image.
+
+        Returns:
+            dict: The URL of every variant, keyed by size name.
+        """
+        with self._lock(image_url):
+            digest = self._index.get(image_url)
+            if digest is None or not self._has_variants(digest):
+                response = http_client.get(image_url)
+                response.raise_for_status()
+                digest = hashlib.sha256(response.content).hexdigest()
+                if not self._has_variants(digest):
+                    self._write_variants(digest, response.content)
+                self._index.set(image_url, digest)
+        return {
+            size: f"{self.url_prefix}/{self._filename(digest, size)}"
+            for size in THUMBNAIL_SIZES
+        }
+
+    def get_species_variants(self, genus, species, count=2):
+        """
+        Returns the variants of the first `count` photos of a species. Photos
+        that cannot be cached are linked at their original URL instead.
+        """
+        variants = []
+        for image_url in get_species_images(genus, species, count=count):
+            try:
+                variants.append(self.get_variants(image_url))
+            except Exception as e:
+                print(f"Could not cache {image_url}: {e}")
+                variants.append(remote_variants(image_url))
+        return variants
+
+    def _write_variants(self, digest, content):
+        with Image.open(io.BytesIO(content)) as image:
+            image = image.convert("RGB")
+            for size, pixels in THUMBNAIL_SIZES.items():
+                variant = image.copy()
+                variant.thumbnail((pixels, pixels))
+                path = os.path.join(self.directory, self._filename(digest, size))
+                # write to a temporary file first so a variant is never served half written
+                variant.save(
+                    f"{path}.tmp",
+                    "JPEG",
+                    quality=self.quality,
+                    optimize=True,
+                    progressive=True,
+                )
+                os.replace(f"{path}.tmp", path)
+
+    def _has_variants(self, digest):
+        return all(
+            os.path.exists(os.path.join(self.directory, self._filename(digest, size)))
+            for size in THUMBNAIL_SIZES
+        )
+
+    def _filename(self, digest, size):
+        return f"{digest}_{size}.jpg"
+
+    def _lock(self, image_url):
+        return self._locks[hash(image_url) % len(self._locks)]
@@ -1,15 +1,35 @@
+import functools
 import json
+import os
+import sys
+import time
 
 import gspread
-import requests
+import pandas as pd
 import us
-import wikipediaapi
 from bs4 import BeautifulSoup
 from cryptography.fernet import Fernet
-from geopy.geocoders import Nominatim
 
-# instantiate a Nominatim geocoder
-geolocator = Nominatim(user_agent="temp_shiny_app")
+from . import geo, http_client
+from .cache import MemoryCache, PersistentCache
+
+TAXONOMY_SIDECAR = "taxonomy.json"
+DEFAULT_SPECIES_IMAGE = "https://i.ibb.co/m6YDp69/sorry.jpg"
+WIKIPEDIA_USER_AGENT = "Survey App Ecology (merlin@example.com)"
+
+# one summary cache is shared by every session
+summary_cache = MemoryCache()
+
+# weather readings shared per geohash cell and time bucket by every session
+weather_precision = 5
+weather_bucket_seconds = 15 * 60
+weather_cache = MemoryCache(ttl=weather_bucket_seconds, max_entries=1000)
+
+# classifications are kept in memory until make_app configures an on-disk cache
+taxonomy_cache = PersistentCache()
+
+# classifications precomputed for the data source CSVs, see load_taxonomy_sidecar
+precomputed_taxonomy = {}
 
 
 def get_species_image(genus, species, image_number, family=None, order=None):
@@ -24,42 +44,87 @@ def get_species_image(genus, species, image_number, family=None, order=None):
     Returns:
         str: The URL of the species image, or a default image URL if no image is found.
     """
-    base_url = "https://api.inaturalist.org/v1/taxa/autocomplete"
+    return get_species_images(
+        genus, species, count=image_number + 1, family=family, order=order
+    )[image_number]
+
+
+def get_species_images(genus, species, count=2, family=None, order=None):
+    """
+    Retrieves the first `count` image URLs for a given species.
+
+    The taxon is resolved and its photos are fetched once; both lookups are
+    memoized, so repeat selections of the same species cost no requests.
+
+    Args:
+        genus (str): The genus of the species.
+        species (str): The species name.
+        count (int): The number of image URLs to return.
+        family (str): Look up the family instead of the species.
+        order (str): Look up the order instead of the family or species.
+
+    Returns:
+        list: `count` image URLs, padded with a default image URL if fewer photos are found.
+    """
     query = (
         order
         if order is not None
         else family if family is not None else f"{genus} {species}"
     )
-    params = {
-        "q": query,
-        "limit": 1,  # Limit to the first result
-    }
+    try:
+        taxon_id = _get_taxon_id(query)
+        photos = get_taxon_photos(taxon_id) if taxon_id else []
+    except LookupError:
+        photos = []
+
+    # taxa with a single photo are treated as having none, as before
+    if len(photos) < 2:
+        photos = []
+    photos = list(photos[:count])
+    return photos + [DEFAULT_SPECIES_IMAGE] * (count - len(photos))
+
+
+@functools.lru_cache(maxsize=2048)
+def _get_taxon_id(query):
+    response = http_client.get(
+        "https://api.inaturalist.org/v1/taxa/autocomplete",
+        params={"q": query, "limit": 1},  # Limit to the first result
+    )
+    if response.status_code != 200:
+        raise LookupError(f"iNaturalist autocomplete failed for {query}")
+    data = response.json()
+    if data["results"] and data["results"][0]["id"]:
+        return data["results"][0]["id"]
+    return None
 
-    response = requests.get(base_url, params=params)
 
-    if response.status_code == 200:
-        data = response.json()
-        if data["results"] and data["results"][0]["id"]:
-            taxon_id = data["results"][0]["id"]
-            photo_url = f"https://api.inaturalist.org/v1/taxa/{taxon_id}?locale=en"
-            photo_response = requests.get(photo_url)
-            if photo_response.status_code == 200:
-                photo_data = photo_response.json()
-                if (
-                    photo_data["results"]
-                    and photo_data["results"][0]["taxon_photos"]
-                    and len(photo_data["results"][0]["taxon_photos"]) > 1
-                ):
-                    if (
-                        "large_url"
-                        in photo_data["results"][0]["taxon_photos"][1]["photo"]
-                    ):
-                        image_url = photo_data["results"][0]["taxon_photos"][
-                            image_number
-                        ]["photo"]["large_url"]
-                        return image_url
-
-    return "https://i.ibb.co/m6YDp69/sorry.jpg"
+@functools.lru_cache(maxsize=2048)
+def get_taxon_photos(taxon_id):
+    """
+    Retrieves the URLs of all the large photos of an iNaturalist taxon.
+
+    Args:
+        taxon_id (int): The iNaturalist taxon id.
+
+    Returns:
+        tuple: The large photo URLs, in the order iNaturalist lists them.
+
+    Raises:
+        LookupError: If iNaturalist does not respond successfully. Failures are not memoized.
+    """
+    response = http_client.get(
+        f"https://api.inaturalist.org/v1/taxa/{taxon_id}?locale=en"
+    )
+    if response.status_code != 200:
+        raise LookupError(f"iNaturalist taxon lookup failed for {taxon_id}")
+    data = response.json()
+    if not data["results"]:
+        return ()
+    return tuple(
+        taxon_photo["photo"]["large_url"]
+        for taxon_photo in data["results"][0]["taxon_photos"] or []
+        if "large_url" in taxon_photo["photo"]
+    )
 
 
 # use this if you want to use the openweathermap API
@@ -73,7 +138,7 @@ def get_current_temperature(survey_config, latitude, longitude):
     }
 
     try:
-        response = requests.get(base_url, params=params)
+        response = http_client.get(base_url, params=params)
         data = response.json()
 
         if response.status_code == 200:
@@ -88,13 +153,104 @@ def get_current_temperature(survey_config, latitude, longitude):
 
 
 def get_summary_for_specimen(genus, species):
-    wiki_wiki = wikipediaapi.Wikipedia("Survey App Ecology (merlin@example.com)", "en")
-    page_py = wiki_wiki.page(f"{genus} {species}")
+    title = f"{genus} {species}"
+    return get_summaries_for_specimens([title])[title]
 
-    if page_py.exists():
-        return page_py.summary
-    else:
-        return "No notes found"
+
+def get_summaries_for_specimens(titles, batch_size=20):
+    """
+    Fetches the Wikipedia summaries for many titles, a batch of titles per
+    MediaWiki request, and stores them in the shared summary cache. Titles that
+    are already cached are not requested again.
+
+    Args:
+        titles (list): The "Genus species" titles to look up.
+        batch_size (int): The number of titles per request. MediaWiki returns
+            at most 20 intro extracts per request.
+
+    Returns:
+        dict: The summary of every title, or "No notes found" if it has no page.
+    """
+    summaries = {title: summary_cache.get(title) for title in dict.fromkeys(titles)}
+    missing = [title for title, summary in summaries.items() if summary is None]
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start : start + batch_size]
+        response = http_client.get(
+            "https://en.wikipedia.org/w/api.php",
+            params={
+                "action": "query",
+                "prop": "extracts",
+                "exintro": 1,
+                "explaintext": 1,
+                "exlimit": batch_size,
+                "redirects": 1,
+                "titles": "|".join(batch),
+                "format": "json",
+            },
+            headers={"User-Agent": WIKIPEDIA_USER_AGENT},
+        )
+        response.raise_for_status()
+        query = response.json().get("query", {})
+        extracts = {
+            page["title"]: page.get("extract", "").strip()
+            for page in query.get("pages", {}).values()
+            if "missing" not in page
+        }
+        renamed = {
+            item["from"]: item["to"]
+            for item in query.get("normalized", []) + query.get("redirects", [])
+        }
+        for title in batch:
+            resolved = title
+            while resolved in renamed and renamed[resolved] != resolved:
+                resolved = renamed[resolved]
+            summary = extracts.get(resolved) or "No notes found"
+            summary_cache.set(title, summary)
+            summaries[title] = summary
+    return summaries
+
+
+def configure_summary_cache(ttl=24 * 60 * 60, max_entries=2048):
+    """
+    Replaces the process-wide Wikipedia summary cache.
+
+    Args:
+        ttl (float): The number of seconds a summary stays valid.
+        max_entries (int): The maximum number of summaries kept.
+
+    Returns:
+        MemoryCache: The newly configured cache.
+    """
+    global summary_cache
+    summary_cache = MemoryCache(ttl=ttl, max_entries=max_entries)
+    return summary_cache
+
+
+def configure_taxonomy_cache(path, ttl=30 * 24 * 60 * 60, max_entries=10000):
+    """
+    Replaces the cache used by fetch_specimen_classification with an on-disk one.
+
+    Args:
+        path (str): The path of the SQLite database file.
+        ttl (float): The number of seconds a classification stays valid.
+        max_entries (int): The maximum number of classifications kept.
+
+    Returns:
+        PersistentCache: The newly configured cache.
+    """
+    global taxonomy_cache
+    taxonomy_cache = PersistentCache(path, ttl=ttl, max_entries=max_entries)
+    return taxonomy_cache
+
+
+def taxonomy_key(genus, species, common_name):
+    """
+    Builds the normalized cache key for a (genus, species, common name) query.
+    """
+    return "|".join(
+        " ".join(str(value or "").lower().split())
+        for value in (genus, species, common_name)
+    )
 
 
 def fetch_specimen_classification(genus, species, common_name):
@@ -118,6 +274,10 @@ def fetch_specimen_classification(genus, species, common_name):
         "class": "unknown",
     }
 
+    key = taxonomy_key(genus, species, common_name)
+    if key in precomputed_taxonomy:
+        return dict(precomputed_taxonomy[key])
+
     if genus and genus not in ["None", "Unknown", "unknown", "other"]:
         if species and species not in ["None", "Unknown", "unknown", "other"]:
             species_scientific_name = f"{genus} {species}"
@@ -133,12 +293,16 @@ def fetch_specimen_classification(genus, species, common_name):
     else:
         return results
 
-    response = requests.get(url)
+    cached = taxonomy_cache.get(key)
+    if cached is not None:
+        return cached
+
+    response = http_client.get(url)
     if response.json()["results"][0]:
         data = response.json()["results"][0]
         url1 = f"https://api.inaturalist.org/v1/observations?verifiable=true&taxon_id={data['id']}"
 
-        response = requests.get(url1)
+        response = http_client.get(url1)
         data = response.json()
         ranks = data["results"][0]["identifications"][0]["taxon"]["ancestors"]
 
@@ -149,30 +313,168 @@ def fetch_specimen_classification(genus, species, common_name):
                 results["order"] = rank["name"]
             if rank["rank"] == "class":
                 results["class"] = rank["name"]
+        taxonomy_cache.set(key, results)
     return results
 
 
-# this approach helps get weather without an API key
+def build_taxonomy_sidecar(survey_config, csv_dir, sidecar_path=None):
+    """
+    Classifies every row of every survey data source CSV and writes the results
+    to a JSON sidecar file that make_app loads at startup.
+
+    Rows that share a (genus, species, common name) query are classified once,
+    and rows that cannot be classified are left out so the app falls back to a
+    live lookup for them; they are listed once every data source is done.
+    iNaturalist is queried at most `taxonomy_sidecar.requests_per_second` times
+    a second (1 by default), as every classification takes up to two requests.
+
+    Args:
+        survey_config (dict): The parsed survey.yaml file.
+        csv_dir (str): The directory containing the data source CSV files.
+        sidecar_path (str): Where to write the sidecar. Defaults to taxonomy.json in csv_dir.
+
+    Returns:
+        dict: The classifications written, keyed by data source and then by query.
+    """
+    if sidecar_path is None:
+        sidecar_path = os.path.join(csv_dir, TAXONOMY_SIDECAR)
+    sidecar_config = survey_config.get("taxonomy_sidecar") or {}
+    interval = 2 / float(sidecar_config.get("requests_per_second", 1))
+
+    sources = {}
+    classified = {}
+    skipped = []
+    next_turn = time.monotonic()
+    for data_source in survey_config["survey_data_sources"]:
+        df = pd.read_csv(f"{csv_dir}/{data_source}.csv", keep_default_na=False)
+        if "Common Name" not in df.columns:
+            df["Common Name"] = ""
+        entries = {}
+        rows = df[["Genus", "Species", "Common Name"]].itertuples(
+            index=False, name=None
+        )
+        for index, (genus, species, common_name) in enumerate(rows, start=1):
+            key = taxonomy_key(genus, species, common_name)
+            if key not in classified:
+                time.sleep(max(0.0, next_turn - time.monotonic()))
+                next_turn = time.monotonic() + interval
+                try:
+                    classified[key] = fetch_specimen_classification(
+                        genus=genus, species=species, common_name=common_name
+                    )
+                except Exception as e:
+                    print(f"\nCould not classify {genus} {species} ({common_name}): {e}")
+                    classified[key] = None
+            if classified[key] is not None:
+                entries[key] = classified[key]
+            else:
+                skipped.append(f"{data_source} row {index}: {genus} {species} ({common_name})")
+            sys.stdout.write(f"\r{data_source}: {index}/{len(df)} rows classified")
+            sys.stdout.flush()
+        print()
+        sources[data_source] = entries
+
+    if skipped:
+        print(f"{len(skipped)} row(s) could not be classified and are looked up live:")
+        for row in skipped:
+            print(f"  {row}")
+
+    with open(sidecar_path, "w") as file:
+        json.dump({"version": 1, "sources": sources}, file, indent=1, sort_keys=True)
+    return sources
+
+
+def load_taxonomy_sidecar(sidecar_path):
+    """
+    Loads a sidecar written by build_taxonomy_sidecar so that
+    fetch_specimen_classification answers from memory for the rows it covers.
+
+    Args:
+        sidecar_path (str): The path of the sidecar JSON file.
+
+    Returns:
+        int: The number of classifications loaded, 0 if the file does not exist.
+    """
+    if not os.path.exists(sidecar_path):
+        return 0
+    with open(sidecar_path, "r") as file:
+        sidecar = json.load(file)
+    for entries in sidecar.get("sources", {}).values():
+        precomputed_taxonomy.update(entries)
+    return len(precomputed_taxonomy)
+
+
+def configure_weather_cache(bucket_minutes=15, precision=5):
+    """
+    Sets how observations share weather readings and replaces the weather cache.
+
+    Args:
+        bucket_minutes (float): The length of the time buckets readings are shared in.
+        precision (int): The geohash precision of the cells readings are shared in.
+
+    Returns:
+        MemoryCache: The newly configured cache.
+    """
+    global weather_bucket_seconds, weather_precision, weather_cache
+    weather_bucket_seconds = bucket_minutes * 60
+    weather_precision = precision
+    weather_cache = MemoryCache(ttl=weather_bucket_seconds, max_entries=1000)
+    return weather_cache
+
+
+def get_cache_stats():
+    """
+    Returns the hit and miss counters of the process-wide lookup caches.
+    """
+    return {
+        "weather": weather_cache.stats(),
+        "geocode": geo.geocode_cache.stats(),
+        "timezone": geo.timezone_cache.stats(),
+        "summary": summary_cache.stats(),
+    }
+
+
+def log_cache_stats():
+    """
+    Prints the hit and miss counters of the process-wide lookup caches.
+    """
+    stats = ", ".join(
+        f"{name} {counts['hits']} hits/{counts['misses']} misses "
+        f"({counts['size']} entries)"
+        for name, counts in get_cache_stats().items()
+    )
+    print(f"Lookup caches: {stats}")
+
+
 def get_weather_underground_temperature(latitude, longitude):
-    location = geolocator.reverse(latitude + "," + longitude)
-    address = location.raw["address"]
-    country_code = address.get("country_code", "")
-    city = (
-        address.get("city", address.get("village", address.get("hamlet", "")))
-        .lower()
-        .replace(" ", "-")
+    """
+    Returns the current temperature at a coordinate. Readings are shared by all
+    observations in the same geohash cell and time bucket, so one page is
+    fetched per cell and bucket.
+    """
+    cell = geo.geohash(float(latitude), float(longitude), weather_precision)
+    bucket = int(time.time() // weather_bucket_seconds)
+    return weather_cache.get_or_compute(
+        (cell, bucket), lambda: _scrape_weather_underground(latitude, longitude)
     )
+
+
+# this approach helps get weather without an API key
+def _scrape_weather_underground(latitude, longitude):
+    place = geo.reverse_geocode(latitude, longitude)
+    country_code = place["country_code"]
+    city = place["city"].lower().replace(" ", "-")
     if country_code == "us":
-        state = us.states.lookup(address.get("state", "")).abbr.lower()
+        state = us.states.lookup(place["state"]).abbr.lower()
         url = f"https://www.wunderground.com/weather/{country_code}/{state}/{city}"
     else:
-        state = address.get("state", "").lower()
+        state = place["state"].lower()
         url = f"https://www.wunderground.com/weather/{country_code}/{city}"
 
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3"
     }
-    page = requests.get(url, headers=headers)
+    page = http_client.get(url, headers=headers)
     soup = BeautifulSoup(page.content, "html.parser")
 
     weather = soup.find(class_="current-temp")
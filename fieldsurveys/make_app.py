@@ -1,4 +1,5 @@
 import ast
+import asyncio
 import datetime
 import json
 from pathlib import Path
@@ -6,29 +7,73 @@ from typing import List
 
 import gspread_dataframe as gd
 import pandas as pd
-import pytz
 import shinyswatch
 import sys
+import time
 import yaml
 from faicons import icon_svg
 from shiny import App, reactive, render, req, ui
 from shiny.types import NavSetArg
-from timezonefinder import TimezoneFinder
+from starlette.responses import JSONResponse
 
+from fieldsurveys.app_files.background import gather_as_completed
+from fieldsurveys.app_files.cache import survey_cache_dir
+from fieldsurveys.app_files.catalog import (
+    ALPHA_CODE,
+    BINOMIAL,
+    COMMON_NAME,
+    CatalogWatcher,
+    SpeciesCatalog,
+)
+from fieldsurveys.app_files.enrichment import (
+    DEFAULT_LATITUDE,
+    DEFAULT_LONGITUDE,
+    ENRICHED_FIELDS,
+    PENDING,
+    ROW_ID,
+    UNAVAILABLE,
+    EnrichmentQueue,
+    enrich_observation,
+    local_time,
+    new_row_id,
+    observation_location,
+)
+from fieldsurveys.app_files.geo import (
+    configure_geocoder,
+    configure_timezone_finder,
+)
+from fieldsurveys.app_files.http_client import configure_http_client
 from fieldsurveys.app_files.image_upload import (
     upload_image_to_drive,
 )
 from fieldsurveys.app_files.navbar_utils import (
+    observations_pager_controls,
     record_observation,
     verify_observation,
     loading_tag,
 )
+from fieldsurveys.app_files.observations import ObservationStore, grid_window
+from fieldsurveys.app_files.prefetch import (
+    configure_prefetch,
+    prefetch_species_notes,
+    select_prefetch_species,
+)
+from fieldsurveys.app_files.thumbnails import (
+    THUMBNAIL_SIZES,
+    ThumbnailCache,
+    remote_variants,
+)
 from fieldsurveys.app_files.utils import (
+    DEFAULT_SPECIES_IMAGE,
+    TAXONOMY_SIDECAR,
+    configure_summary_cache,
+    configure_taxonomy_cache,
+    configure_weather_cache,
     fetch_specimen_classification,
-    get_species_image,
     get_summary_for_specimen,
-    get_weather_underground_temperature,
     get_workbook,
+    load_taxonomy_sidecar,
+    log_cache_stats,
 )
 import os
 
@@ -71,6 +116,64 @@ def make_app(
             )
             sys.exit(1)
 
+    configure_http_client(survey_config.get("http") or {})
+
+    # lookups are cached in the user's cache directory unless a cache_dir is
+    # configured next to survey.yaml
+    cache_dir = survey_cache_dir(survey_path, survey_config.get("cache_dir"))
+    # species lists are compiled once (see `fieldsurveys-compile`), loaded
+    # memory-mapped at startup and shared by all sessions
+    catalog = SpeciesCatalog(
+        csv_dir,
+        survey_config["survey_data_sources"],
+        compiled_dir=os.path.join(cache_dir, "catalog"),
+    )
+    catalog.load_all()
+    # changed CSVs and data sources added to survey.yaml are picked up without
+    # a restart; sessions keep the list they use until they switch data source
+    hot_reload_config = survey_config.get("hot_reload") or {}
+    if hot_reload_config.get("enabled", False):
+        CatalogWatcher(
+            catalog,
+            survey_path,
+            interval=float(hot_reload_config.get("interval_seconds", 2)),
+        ).start()
+    specimen_search_config = survey_config.get("specimen_search") or {}
+    taxonomy_cache_config = survey_config.get("taxonomy_cache") or {}
+    configure_taxonomy_cache(
+        os.path.join(cache_dir, "taxonomy.sqlite3"),
+        ttl=float(taxonomy_cache_config.get("ttl_days", 30)) * 24 * 60 * 60,
+        max_entries=int(taxonomy_cache_config.get("max_entries", 10000)),
+    )
+    summary_cache_config = survey_config.get("summary_cache") or {}
+    configure_summary_cache(
+        ttl=float(summary_cache_config.get("ttl_hours", 24)) * 60 * 60,
+        max_entries=int(summary_cache_config.get("max_entries", 2048)),
+    )
+    configure_prefetch(survey_config.get("prefetch") or {})
+    thumbnail_cache = ThumbnailCache(
+        os.path.join(cache_dir, "thumbnails"),
+        index_path=os.path.join(cache_dir, "thumbnails.sqlite3"),
+    )
+    geocode_config = survey_config.get("geocode") or {}
+    configure_geocoder(
+        precision=int(geocode_config.get("precision", 6)),
+        mode=geocode_config.get("mode", "online"),
+    )
+    if not survey_config.get("timezone"):
+        timezone_config = survey_config.get("timezone_lookup") or {}
+        configure_timezone_finder(
+            precision=int(timezone_config.get("precision", 6)),
+            in_memory=bool(timezone_config.get("in_memory", False)),
+        )
+    weather_config = survey_config.get("weather") or {}
+    configure_weather_cache(
+        bucket_minutes=float(weather_config.get("bucket_minutes", 15)),
+        precision=int(weather_config.get("precision", 5)),
+    )
+    # classifications precomputed with `fieldsurveys-enrich`, if any
+    load_taxonomy_sidecar(os.path.join(csv_dir, TAXONOMY_SIDECAR))
+
     def nav_controls(prefix: str) -> List[NavSetArg]:
         return [
             record_observation(survey_config),
@@ -93,8 +196,7 @@ def make_app(
     )
 
     def server(input, output, session):
-        new_df = pd.DataFrame(
-            [],
+        observations = ObservationStore(
             columns=[
                 "Data Source",
                 "Bandwidth Saver",
@@ -118,101 +220,197 @@ def make_app(
                 "Abundance",
             ],
         )
-        val = reactive.Value(new_df)
+        # the version of `observations`, set after every change so outputs
+        # depending on the observations are invalidated
+        val = reactive.Value(observations.version)
         notes_val = reactive.Value(None)
         accuracy_val = reactive.Value(None)
         url_val = reactive.Value(None)
         index_to_delete_val = reactive.Value(None)
+        upload_deadline_val = reactive.Value(None)
+
+        @reactive.Effect
+        @reactive.event(val)
+        async def _save_observations():
+            # the browser keeps a journal of the changes in IndexedDB so the
+            # observations survive a reload, see verify_observation
+            changes = observations.take_changes()
+            if changes:
+                await session.send_custom_message("journal", changes)
+
+        async def apply_enrichment(row_id):
+            async with reactive.lock():
+                fields = enrichment.take(row_id)
+                if not fields:
+                    return
+                observations.update(row_id, fields)
+                val.set(observations.version)
+                await reactive.flush()
+
+        enrichment = EnrichmentQueue(apply_enrichment)
+        session.on_ended(enrichment.cancel_all)
+        # how well the lookups shared by the sessions are cached
+        session.on_ended(log_cache_stats)
 
         @reactive.Effect
         async def _upload():
-            df = data_source()
+            cancel_notes_task()
             notes_val.set(None)
             req(input.specimen())
-            x = str(input.specimen())
-            cols_to_check = ["Alpha Code", "Common Name", "Genus", "Species"]
-            all_exist = all(elem in df.columns for elem in cols_to_check)
-
-            if not df.empty and all_exist:
-                if input.alpha_code():
-                    req(any((df["Alpha Code"] == x)))
-                    species_data = df.loc[df["Alpha Code"] == x].iloc[0]
-                elif input.genus_species():
-                    req(any((df["Genus"] + " " + df["Species"] == x)))
-                    species_data = df.loc[df["Genus"] + " " + df["Species"] == x].iloc[
-                        0
-                    ]
-                else:
-                    req(any((df["Common Name"] == x)))
-                    species_data = df.loc[df["Common Name"] == x].iloc[0]
-                genus = species_data["Genus"]
-                species = species_data["Species"]
-                unknown_values = ["unknown", "Unknown", "UNKOWN", "None", "other"]
+            species_data = selected_species()
+            req(species_data)
+            genus = species_data["Genus"]
+            species = species_data["Species"]
+            unknown_values = ["unknown", "Unknown", "UNKOWN", "None", "other"]
+            # notes are only shown for specimens with a known genus
+            if genus not in unknown_values:
+                image_species = "" if species in unknown_values else species
+                calls = {
+                    "images": (
+                        thumbnail_cache.get_species_variants,
+                        (genus, image_species),
+                    )
+                }
+                # Bandwidth Saver shows small thumbnails without the trivia
                 if not input.low_data_mode():
-                    id_notes = get_summary_for_specimen(genus, species)
-                    if genus not in unknown_values and species not in unknown_values:
-                        image_url = get_species_image(genus, species, image_number=0)
-                        image_url_2 = get_species_image(genus, species, image_number=1)
-                    elif genus in unknown_values and species in unknown_values:
-                        results = fetch_specimen_classification(
-                            genus=genus,
-                            species=species,
-                            common_name=species_data["Common Name"],
-                        )
-                        order = results["order"]
-                        image_url = get_species_image(
-                            order=order, genus=genus, species=species, image_number=0
-                        )
-                        image_url_2 = get_species_image(
-                            order=order, genus=genus, species=species, image_number=1
-                        )
-                    elif genus not in unknown_values and species in unknown_values:
-                        species = ""
-                        image_url = get_species_image(genus, species, image_number=0)
-                        image_url_2 = get_species_image(genus, species, image_number=1)
-                    elif x.lower().startswith("unknown"):
-                        results = fetch_specimen_classification(
-                            genus=genus,
-                            species=species,
-                            common_name=species_data["Common Name"],
-                        )
-                        order = results["order"]
-                        image_url = get_species_image(order=order, image_number=0)
-                        image_url_2 = get_species_image(order=order, image_number=1)
-                    if genus not in unknown_values and species not in unknown_values:
-                        m = ui.TagList(
-                            ui.markdown(
-                                f"### <ins>{species_data['Common Name']}</ins> notes"
-                            ),
-                            ui.h6("Source: Wikipedia"),
-                            id_notes,
-                            ui.br(),
-                            ui.br(),
-                            ui.markdown(
-                                f"### <ins>{species_data['Common Name']}</ins> pics"
-                            ),
-                            ui.h6("Source: iNaturalist"),
-                            ui.tags.img(
-                                src=image_url, style="width: 100%;height: auto"
-                            ),
-                            ui.tags.img(
-                                src=image_url_2, style="width: 100%;height: auto"
-                            ),
+                    calls["summary"] = (get_summary_for_specimen, (genus, species))
+                notes_val.set(
+                    {
+                        "common_name": species_data["Common Name"],
+                        "low_data_mode": input.low_data_mode(),
+                    }
+                )
+                start_notes_task(calls)
+
+        notes_task = None
+
+        def cancel_notes_task():
+            nonlocal notes_task
+            if notes_task is not None:
+                notes_task.cancel()
+                notes_task = None
+
+        def start_notes_task(calls):
+            # lookups run in the background so partial results reach the
+            # browser as soon as each one arrives
+            nonlocal notes_task
+            notes_task = asyncio.create_task(_load_notes(calls))
+
+        async def _load_notes(calls):
+            async def on_result(name, result, error):
+                async with reactive.lock():
+                    if asyncio.current_task() is not notes_task:
+                        return
+                    with reactive.isolate():
+                        notes = notes_val.get()
+                    if error is not None:
+                        result = (
+                            "No notes found"
+                            if name == "summary"
+                            else [remote_variants(DEFAULT_SPECIES_IMAGE)] * 2
                         )
-                        notes_val.set(m)
+                    notes_val.set({**notes, name: result})
+                    await reactive.flush()
+
+            await gather_as_completed(
+                calls,
+                timeout=float(survey_config.get("notes_timeout_seconds", 15)),
+                on_result=on_result,
+            )
 
         @render.ui
         def notes_txt():
-            return notes_val.get()
+            notes = notes_val.get()
+            if notes is None:
+                return None
+            common_name = notes["common_name"]
+            images = notes.get("images")
+            if images is None:
+                pics = loading_tag
+            elif notes["low_data_mode"]:
+                pics = [ui.tags.img(src=variants["small"]) for variants in images]
+            else:
+                pics = [
+                    ui.tags.img(
+                        src=variants["large"],
+                        srcset=", ".join(
+                            f"{variants[size]} {pixels}w"
+                            for size, pixels in THUMBNAIL_SIZES.items()
+                        ),
+                        sizes="(max-width: 600px) 100vw, 75vw",
+                        style="width: 100%;height: auto",
+                    )
+                    for variants in images
+                ]
+            return ui.TagList(
+                (
+                    ui.TagList(
+                        ui.markdown(f"### <ins>{common_name}</ins> notes"),
+                        ui.h6("Source: Wikipedia"),
+                        notes.get("summary", loading_tag),
+                        ui.br(),
+                        ui.br(),
+                    )
+                    if not notes["low_data_mode"]
+                    else None
+                ),
+                ui.markdown(f"### <ins>{common_name}</ins> pics"),
+                ui.h6("Source: iNaturalist"),
+                pics,
+            )
 
         @reactive.Calc
-        def data_source():
-            df = pd.read_csv(
-                f"{csv_dir}/{input.data_source()}.csv", keep_default_na=False
+        def species_list():
+            # the index the session uses until it switches data source, even if
+            # the data source is reloaded meanwhile
+            return catalog.index(input.data_source())
+
+        if hot_reload_config.get("enabled", False):
+
+            @reactive.poll(
+                lambda: tuple(catalog.data_sources),
+                float(hot_reload_config.get("interval_seconds", 2)),
+            )
+            def data_sources():
+                return list(catalog.data_sources)
+
+            shown_data_sources = reactive.Value(
+                list(survey_config["survey_data_sources"])
+            )
+
+            @reactive.Effect
+            def _data_sources():
+                choices = data_sources()
+                with reactive.isolate():
+                    if choices == shown_data_sources.get():
+                        return
+                    selected = input.data_source()
+                shown_data_sources.set(choices)
+                ui.update_radio_buttons(
+                    "data_source",
+                    choices=choices,
+                    selected=selected if selected in choices else None,
+                )
+
+        else:
+            # without hot reload the list never changes, so nothing is polled
+            def data_sources():
+                return list(catalog.data_sources)
+
+        @reactive.Calc
+        def display_mode():
+            if input.alpha_code():
+                return ALPHA_CODE
+            elif input.genus_species():
+                return BINOMIAL
+            return COMMON_NAME
+
+        @reactive.Calc
+        def selected_species():
+            # the data source row of the selected specimen, or None
+            return species_list().lookup(
+                display_mode(), str(input.specimen())
             )
-            if "Alpha Code" not in df.columns:
-                df["Alpha Code"] = None
-            return df
 
         @reactive.Effect
         def _gps_loc():
@@ -227,41 +425,49 @@ def make_app(
         def note_accuracy():
             return accuracy_val.get()
 
+        def specimen_choices(index, mode):
+            # serves the best matches of what the surveyor types; selectize
+            # asks again as the query changes rather than for further pages
+            def handler(request):
+                params = request.query_params
+                page_size = int(specimen_search_config.get("page_size", 50))
+                limit = min(int(params.get("maxop", page_size)), page_size)
+                keys = index.search(mode, params.get("query", ""), limit=limit)
+                return JSONResponse([{"value": key, "label": key} for key in keys])
+
+            return handler
+
         @reactive.Effect
         def _specimen():
-            df = data_source()
-            if input.alpha_code():
-                if "Alpha Code" in df.columns:
-                    ui.update_selectize(
-                        "specimen",
-                        label="Select the specimen observed",
-                        choices=list(df["Alpha Code"]),
-                        selected="",
-                    )
-            elif input.genus_species():
+            index = species_list()
+            mode = display_mode()
+            if specimen_search_config.get("server", True):
+                # only the matches of what is typed are sent to the browser
+                session.send_input_message(
+                    "specimen",
+                    {
+                        "label": "Select the specimen observed",
+                        "value": "",
+                        "url": session.dynamic_route(
+                            "specimen_choices", specimen_choices(index, mode)
+                        ),
+                    },
+                )
+            else:
                 ui.update_selectize(
                     "specimen",
                     label="Select the specimen observed",
-                    choices=list(df["Genus"] + " " + df["Species"]),
+                    choices=index.choices(mode),
                     selected="",
                 )
-            else:
-                if "Common Name" in df.columns:
-                    ui.update_selectize(
-                        "specimen",
-                        label="Select the specimen observed",
-                        choices=list(df["Common Name"]),
-                        selected="",
-                    )
 
         def show_deletion_modal():
-            df = val.get()
-            index = int(index_to_delete_val.get())
+            observation = observations.get(index_to_delete_val.get())
             m = ui.modal(
                 ui.br(),
                 ui.markdown("### Confirm deletion"),
                 ui.markdown(
-                    f"Are you sure you want to delete this observation for {df.loc[index, 'Common Name']}?"
+                    f"Are you sure you want to delete this observation for {observation['Common Name']}?"
                 ),
                 ui.br(),
                 ui.br(),
@@ -293,10 +499,10 @@ def make_app(
         @reactive.event(input.confirm_deletion)
         def confirm_deletion():
             ui.modal_remove()
-            df = val.get()
-            index = index_to_delete_val.get()
-            df = delete_row_in_df(df, index)
-            val.set(df)
+            row_id = index_to_delete_val.get()
+            enrichment.cancel(row_id)
+            observations.delete(row_id)
+            val.set(observations.version)
 
             m = ui.modal(
                 "Your observation has been cleared",
@@ -308,21 +514,44 @@ def make_app(
         @reactive.Effect
         @reactive.event(input.reset)
         def _reset():
-            df = val.get()
-            if not df.empty:
+            if len(observations) and shown_grid_window.get() is not None:
                 index_to_delete = list(input.observations_data_frame_selected_rows())
-                if index_to_delete and index_to_delete[0] in df.index:
-                    index_to_delete_val.set(index_to_delete[0])
+                # the grid only shows one page, see _grid_window
+                row_ids = shown_grid_window.get()[0]
+                if index_to_delete and index_to_delete[0] < len(row_ids):
+                    index_to_delete_val.set(row_ids[index_to_delete[0]])
                     ui.modal_show(show_deletion_modal())
 
         @reactive.Effect
         @reactive.event(input.upload)
-        async def _send_msg_to_reset():
-            await session.send_custom_message("clear", "clear")
+        def _request_upload():
+            timeout = float(survey_config.get("enrichment_timeout_seconds", 30))
+            upload_deadline_val.set(time.monotonic() + timeout)
+            if enrichment.pending:
+                ui.notification_show(
+                    f"Finishing {len(enrichment.pending)} observation(s) before syncing...",
+                    duration=3,
+                    type="message",
+                )
 
         @reactive.Effect
-        @reactive.event(input.upload)
         async def _upload():
+            deadline = upload_deadline_val.get()
+            req(deadline)
+            if enrichment.pending and time.monotonic() < deadline:
+                # poll rather than wait here, since waiting would hold the
+                # reactive lock the enriched rows are applied under
+                reactive.invalidate_later(0.5)
+                return
+            upload_deadline_val.set(None)
+            for row_id in enrichment.pending:
+                fields = enrichment.take(row_id)
+                if fields:
+                    observations.update(row_id, fields)
+            # rows still being looked up are uploaded with their placeholders
+            enrichment.cancel_all()
+            val.set(observations.version)
+
             workbook = get_workbook(survey_config, keyfile_path)
             worksheet = workbook.worksheet(input.google_sheet_selector())
             data = worksheet.get_all_values()
@@ -336,10 +565,11 @@ def make_app(
             else:
                 next_row_number = int(nan_rows[0])
                 include_column_header = True
-            df = val.get()
+            df = observations.to_frame()
             if not df.empty:
                 df = df.drop(
                     columns=[
+                        ROW_ID,
                         "Data Source",
                         "Bandwidth Saver",
                     ]
@@ -351,10 +581,8 @@ def make_app(
                     resize=True,
                     include_column_header=include_column_header,
                 )
-                df = val.get()
-                # Clear the DataFrame by creating a new empty one
-                df = pd.DataFrame(columns=df.columns)
-                val.set(df)
+                observations.clear()
+                val.set(observations.version)
                 ui.update_selectize(
                     "survey_side",
                     label="Select the side",
@@ -460,32 +688,11 @@ def make_app(
                 ui.modal_show(m)
             req(input.surveyors())
             req(input.specimen())
-            df = data_source()
-            if input.alpha_code():
-                species = df.loc[
-                    df["Alpha Code"] == str(input.specimen()), "Species"
-                ].values[0]
-                genus = df.loc[
-                    df["Alpha Code"] == str(input.specimen()), "Genus"
-                ].values[0]
-                common_name = df.loc[
-                    df["Alpha Code"] == str(input.specimen()), "Common Name"
-                ].values[0]
-            elif input.genus_species():
-                species = str(input.specimen()).split(" ")[1]
-                genus = str(input.specimen()).split(" ")[0]
-                common_name = df.loc[
-                    df["Genus"] + " " + df["Species"] == str(input.specimen()),
-                    "Common Name",
-                ].values[0]
-            else:
-                species = df.loc[
-                    df["Common Name"] == str(input.specimen()), "Species"
-                ].values[0]
-                genus = df.loc[
-                    df["Common Name"] == str(input.specimen()), "Genus"
-                ].values[0]
-                common_name = str(input.specimen())
+            species_data = selected_species()
+            req(species_data)
+            genus = species_data["Genus"]
+            species = species_data["Species"]
+            common_name = species_data["Common Name"]
             results = fetch_specimen_classification(
                 genus=genus, species=species, common_name=common_name
             )
@@ -570,24 +777,71 @@ def make_app(
                 )
             ui.modal_show(m)
 
-        def delete_row_in_df(df, index):
-            df.drop(index, inplace=True)
-            df = pd.DataFrame(df)
-            # Reindex the DataFrame
-            df.reset_index(drop=True, inplace=True)
-            return df
+        # the cards shown in #observations_list, keyed by row id, with the key
+        # and HTML of what they show; a card is only sent again when it changed
+        rendered_cards = {}
+        card_cache = {}
 
-        @output
-        @render.ui
-        def observations_list():
-            m = []
-            for index, row in val.get().iterrows():
-                m.append(get_card_data(index=index, row=row))
-            return ui.TagList(
-                m,
+        @reactive.Effect
+        def _observation_cards():
+            val.get()
+            # wide screens show the grid instead; the cards catch up with every
+            # change at once when the screen becomes narrow
+            if input.isWide():
+                return
+            plant_survey = str(input.plant_survey()) == "Yes"
+            row_ids = observations.row_ids()
+            current = set(row_ids)
+            for row_id in [row_id for row_id in rendered_cards if row_id not in current]:
+                ui.remove_ui(f"#card_{row_id}")
+                del rendered_cards[row_id]
+            for key in [key for key in card_cache if key[0] not in current]:
+                del card_cache[key]
+
+            for row_id in row_ids:
+                key = (row_id, observations.row_version(row_id), plant_survey)
+                rendered = rendered_cards.get(row_id)
+                if rendered is not None and rendered[0] == key:
+                    continue
+                card = card_cache.get(key)
+                if card is None:
+                    card = get_card_data(row_id, observations.get(row_id), plant_survey)
+                    card_cache[key] = card
+                html = str(card)
+                if rendered is None:
+                    # rows are only ever added after the existing ones
+                    ui.insert_ui(
+                        ui.div(card, id=f"card_{row_id}"),
+                        selector="#observations_list",
+                        where="beforeEnd",
+                    )
+                elif rendered[1] != html:
+                    # replace the content in place so the card keeps its position
+                    ui.remove_ui(f"#card_{row_id} > *", multiple=True)
+                    ui.insert_ui(card, selector=f"#card_{row_id}", where="beforeEnd")
+                if rendered is not None:
+                    card_cache.pop(rendered[0], None)
+                rendered_cards[row_id] = (key, html)
+
+        @reactive.Effect
+        @reactive.event(input.delete_row)
+        def _delete_row():
+            # the row id sent by the delete button of a card, see verify_observation
+            row_id = input.delete_row()
+            if row_id in observations:
+                index_to_delete_val.set(row_id)
+                ui.modal_show(show_deletion_modal())
+
+        def delete_button(row_id):
+            # a plain button: clicks on every card are handled by one listener
+            return ui.tags.button(
+                icon_svg("trash"),
+                type="button",
+                class_="btn btn-outline-danger",
+                data_row_id=row_id,
             )
 
-        def get_card_data(index, row):
+        def get_card_data(row_id, row, plant_survey):
             date_observed = row["Date observed"]
             location = row["Location"]
             plot = row["Plot"]
@@ -601,7 +855,7 @@ def make_app(
             life_stage = row["Life stage"]
             height = row["Height (cm)"]
             abundance = row["Abundance"]
-            if str(input.plant_survey()) == "Yes":
+            if plant_survey:
                 return ui.card(
                     ui.card_header(
                         ui.h4(f"{common_name}"),
@@ -617,13 +871,7 @@ def make_app(
                     ui.markdown(f"**Life stage:** {life_stage}"),
                     ui.markdown(f"**Height (cm):** {height}"),
                     ui.markdown(f"**Abundance:** {abundance}"),
-                    ui.input_action_button(
-                        f"delete_{index}",
-                        label="",
-                        icon=icon_svg("trash"),
-                        class_="btn btn-outline-danger",
-                        width="px",
-                    ),
+                    delete_button(row_id),
                 )
             else:
                 return ui.card(
@@ -637,72 +885,93 @@ def make_app(
                     ui.markdown(f"**Side:** {side}"),
                     ui.markdown(f"**Count:** {count}"),
                     ui.markdown(f"**Notes:** {notes}"),
-                    ui.input_action_button(
-                        f"delete_{index}",
-                        label="",
-                        icon=icon_svg("trash"),
-                        class_="btn btn-outline-danger",
-                    ),
+                    delete_button(row_id),
                 )
 
-        delete_hooks: list[reactive.Effect] = []
-
-        @reactive.effect
-        @reactive.event(val)
-        def _delete_hooks():
-            def make_hook(index):
-                @reactive.Effect
-                @reactive.event(input[f"delete_{index}"])
-                def delete_row():
-                    index_to_delete_val.set(index)
-                    ui.modal_show(show_deletion_modal())
-
-                return delete_row
+        grid_config = survey_config.get("observations_grid") or {}
+        grid_page_size = int(grid_config.get("page_size", 50))
+        grid_page = reactive.Value(0)
+        # the row ids and the rows of the page shown in the grid; only set when
+        # they change, so changes to other pages do not send the grid again
+        shown_grid_window = reactive.Value(None)
+        # the page buttons are only shown when there is more than one page
+        pager_shown = reactive.Value(False)
 
-            for index in range(len(val.get().index)):
-                if index >= len(delete_hooks):
-                    delete_hooks.append(make_hook(index))
+        @reactive.Effect
+        def _grid_window():
+            val.get()
+            # narrow screens show the cards instead, see _observation_cards
+            req(input.isWide())
+            if str(input.plant_survey()) == "Yes":
+                columns = [
+                    "Date observed",
+                    "Location",
+                    "Plot",
+                    "Surveyors",
+                    "Survey Point",
+                    "Side",
+                    "Common Name",
+                    "Count",
+                    "Notes",
+                    "Canopy cover",
+                    "Life stage",
+                    "Height (cm)",
+                    "Abundance",
+                ]
+            else:
+                columns = [
+                    "Date observed",
+                    "Location",
+                    "Plot",
+                    "Survey Point",
+                    "Side",
+                    "Common Name",
+                    "Count",
+                    "Notes",
+                ]
+            page, row_ids, rows = grid_window(
+                observations.to_frame(), columns, grid_page.get(), grid_page_size
+            )
+            with reactive.isolate():
+                shown = shown_grid_window.get()
+            if shown is None or shown[0] != row_ids or not shown[1].equals(rows):
+                shown_grid_window.set((row_ids, rows))
+            if page != grid_page.get():
+                grid_page.set(page)
+            pager_shown.set(len(observations) > grid_page_size)
 
         @output
         @render.data_frame
         def observations_data_frame():
-            if str(input.plant_survey()) == "Yes":
-                return render.DataGrid(
-                    val.get()[
-                        [
-                            "Date observed",
-                            "Location",
-                            "Plot",
-                            "Surveyors",
-                            "Survey Point",
-                            "Side",
-                            "Common Name",
-                            "Count",
-                            "Notes",
-                            "Canopy cover",
-                            "Life stage",
-                            "Height (cm)",
-                            "Abundance",
-                        ]
-                    ],
-                    row_selection_mode="single",
-                )
-            else:
-                return render.DataGrid(
-                    val.get()[
-                        [
-                            "Date observed",
-                            "Location",
-                            "Plot",
-                            "Survey Point",
-                            "Side",
-                            "Common Name",
-                            "Count",
-                            "Notes",
-                        ]
-                    ],
-                    row_selection_mode="single",
-                )
+            req(shown_grid_window.get())
+            return render.DataGrid(
+                shown_grid_window.get()[1], row_selection_mode="single"
+            )
+
+        @output
+        @render.ui
+        def observations_pager():
+            req(pager_shown.get())
+            return observations_pager_controls()
+
+        @output
+        @render.text
+        def observations_page():
+            val.get()
+            first = grid_page.get() * grid_page_size
+            last = min(first + grid_page_size, len(observations))
+            return f"Observations {first + 1}-{last} of {len(observations)}"
+
+        @reactive.Effect
+        @reactive.event(input.previous_observations)
+        def _previous_observations():
+            grid_page.set(max(0, grid_page.get() - 1))
+
+        @reactive.Effect
+        @reactive.event(input.next_observations)
+        def _next_observations():
+            # _grid_window moves back to the last page if there is no next one
+            grid_page.set(grid_page.get() + 1)
 
         @reactive.Effect
         @reactive.event(input.restore)
@@ -714,12 +983,16 @@ def make_app(
         async def _restore_observations():
             df_string = input.restore_df()
             req(df_string)
-            newValue = val.get()
-            if df_string and newValue.empty:
+            if df_string and not len(observations):
                 df_json = json.loads(df_string)
                 restored_val = str(df_json)
                 restored_df = pd.DataFrame(ast.literal_eval(restored_val))
-                if not newValue.equals(restored_df):
+                if ROW_ID not in restored_df.columns:
+                    # observations saved before rows had ids
+                    restored_df[ROW_ID] = [new_row_id() for _ in restored_df.index]
+                # columns missing from some rows are empty rather than NaN
+                restored_df = restored_df.astype(object).where(restored_df.notna(), None)
+                if not restored_df.empty:
                     ui.update_selectize(
                         id="surveyors",
                         label="Choose Surveyor(s)*:",
@@ -758,7 +1031,7 @@ def make_app(
                     ui.update_radio_buttons(
                         id="data_source",
                         label="Select data source",
-                        choices=survey_config["survey_data_sources"],
+                        choices=data_sources(),
                         selected=restored_df.iloc[-1]["Data Source"],
                     )
 
@@ -795,7 +1068,30 @@ def make_app(
                         show=False,
                     )
 
-                    val.set(restored_df)
+                    # the journal is written again from the restored rows, which
+                    # also gives ids to rows saved without one
+                    rows = restored_df.to_dict("records")
+                    for row in rows:
+                        # the time a row was recorded is not kept, so a local
+                        # time still pending cannot be looked up any more
+                        if row.get("Time observed") == PENDING:
+                            row["Time observed"] = UNAVAILABLE
+                    observations.clear()
+                    observations.extend(rows)
+                    val.set(observations.version)
+                    # lookups that had not finished before the reload
+                    for row in rows:
+                        if PENDING in (row.get(field) for field in ENRICHED_FIELDS):
+                            latitude, longitude = observation_location(row)
+                            enrichment.submit(
+                                row[ROW_ID],
+                                enrich_observation,
+                                genus=row.get("Genus"),
+                                species=row.get("Species"),
+                                common_name=row.get("Common Name"),
+                                latitude=latitude,
+                                longitude=longitude,
+                            )
                 m = ui.modal(
                     "Your observations have been restored",
                     easy_close=True,
@@ -829,28 +1125,23 @@ def make_app(
         @reactive.Effect
         @reactive.event(input.submit_verify)
         def _submit_observation():
-            df = data_source()
             if input.gps_loc():
                 latitude = input.latitude()
                 longitude = input.longitude()
                 gps_location = input.gps_loc()
             else:
                 # use the default location of the SF bay for weather if user did not provide
-                latitude = "37.4803"
-                longitude = "-122.0786"
+                latitude = DEFAULT_LATITUDE
+                longitude = DEFAULT_LONGITUDE
                 gps_location = "None given"
-            if survey_config.get("timezone"):
-                tz = pytz.timezone(survey_config["timezone"])
-                now = datetime.datetime.now(tz)
-            else:
-                tf = TimezoneFinder()
-                now = datetime.datetime.now(
-                    pytz.timezone(
-                        tf.certain_timezone_at(
-                            lng=float(longitude), lat=float(latitude)
-                        )
-                    )
-                )
+            # the timezone finder is loaded at startup, so the local time is
+            # known before the observation is stored
+            time_observed = local_time(
+                datetime.datetime.now(datetime.timezone.utc),
+                latitude,
+                longitude,
+                survey_config.get("timezone"),
+            )
             if str(input.plant_survey()) == "Yes":
                 canopy_cover = str(input.canopy_cover())
                 life_stage = str(input.life_stage())
@@ -862,57 +1153,29 @@ def make_app(
                 height = None
                 abundance = None
 
-            if input.alpha_code():
-                alpha_code = str(input.specimen())
-                common_name = df.loc[
-                    df["Alpha Code"] == str(input.specimen()), "Common Name"
-                ].values[0]
-                species = df.loc[
-                    df["Alpha Code"] == str(input.specimen()), "Species"
-                ].values[0]
-                genus = df.loc[
-                    df["Alpha Code"] == str(input.specimen()), "Genus"
-                ].values[0]
-            elif input.genus_species():
-                species = str(input.specimen()).split(" ")[1]
-                genus = str(input.specimen()).split(" ")[0]
-                alpha_code = df.loc[
-                    df["Genus"] + " " + df["Species"] == str(input.specimen()),
-                    "Alpha Code",
-                ].values[0]
-                common_name = df.loc[
-                    df["Genus"] + " " + df["Species"] == str(input.specimen()),
-                    "Common Name",
-                ].values[0]
-            else:
-                species = df.loc[
-                    df["Common Name"] == str(input.specimen()), "Species"
-                ].values[0]
-                genus = df.loc[
-                    df["Common Name"] == str(input.specimen()), "Genus"
-                ].values[0]
-                alpha_code = df.loc[
-                    df["Common Name"] == str(input.specimen()), "Alpha Code"
-                ].values[0]
-                common_name = str(input.specimen())
-            results = fetch_specimen_classification(
-                genus=genus, species=species, common_name=common_name
-            )
+            species_data = selected_species()
+            req(species_data)
+            alpha_code = species_data["Alpha Code"]
+            common_name = species_data["Common Name"]
+            genus = species_data["Genus"]
+            species = species_data["Species"]
+            row_id = new_row_id()
             data = {
                 "fields": {
+                    ROW_ID: row_id,
                     "Bandwidth Saver": str(input.low_data_mode()),
                     "Data Source": str(input.data_source()),
                     "Date observed": str(input.survey_date()),
-                    "Time observed": str(now.strftime("%I:%M %p")),
+                    "Time observed": time_observed,
                     "Location": str(input.location()),
                     "Plot": str(input.plot()),
                     "Survey Point": str(input.survey_point()),
                     "Side": str(input.survey_side()),
-                    "Genus": results["genus"],
-                    "Species": results["species"],
-                    "Class": results["class"],
-                    "Order": results["order"],
-                    "Family": results["family"],
+                    "Genus": genus if genus else "unknown",
+                    "Species": species if species else "unknown",
+                    "Class": PENDING,
+                    "Order": PENDING,
+                    "Family": PENDING,
                     "Common Name": common_name,
                     "Alpha Code": alpha_code,
                     "Count": str(input.count()),
@@ -921,9 +1184,7 @@ def make_app(
                     "Url": (
                         ", ".join(url_val.get()) if url_val.get() is not None else ""
                     ),
-                    "Weather": get_weather_underground_temperature(
-                        str(latitude), str(longitude)
-                    ),
+                    "Weather": PENDING,
                     "GPS Location": str(gps_location),
                     "Canopy cover": canopy_cover,
                     "Life stage": life_stage,
@@ -932,33 +1193,23 @@ def make_app(
                 }
             }
 
-            newValue = val.get()
-            newValue = newValue._append(data["fields"], ignore_index=True)
-            val.set(newValue)
+            observations.append(data["fields"])
+            val.set(observations.version)
+            # classification and weather are filled in once looked up
+            enrichment.submit(
+                row_id,
+                enrich_observation,
+                genus=genus,
+                species=species,
+                common_name=common_name,
+                latitude=latitude,
+                longitude=longitude,
+            )
             ui.notification_show(
                 "Your observation has been recorded.", duration=2, type="message"
             )
-            if input.alpha_code():
-                ui.update_selectize(
-                    "specimen",
-                    label="Select the specimen observed",
-                    choices=list(df["Alpha Code"]),
-                    selected="",
-                )
-            elif input.genus_species():
-                ui.update_selectize(
-                    "specimen",
-                    label="Select the specimen observed",
-                    choices=list(df["Genus"] + " " + df["Species"]),
-                    selected="",
-                )
-            else:
-                ui.update_selectize(
-                    "specimen",
-                    label="Select the specimen observed",
-                    choices=list(df["Common Name"]),
-                    selected="",
-                )
+            # clear the selection, the choices stay as they are
+            ui.update_selectize("specimen", selected="")
             ui.update_selectize(
                 "count",
                 label="Count observed",
@@ -987,12 +1238,41 @@ def make_app(
             ui.modal_remove()
             url_val.set(None)
 
+        prefetch_task = None
+
+        def cancel_prefetch():
+            nonlocal prefetch_task
+            if prefetch_task is not None:
+                prefetch_task.cancel()
+                prefetch_task = None
+
+        session.on_ended(cancel_prefetch)
+
         @reactive.Effect
-        @reactive.event(input.submit_verify)
-        async def _submit_msg():
-            await session.send_custom_message(
-                "df", str(val.get().to_json(orient="records"))
+        @reactive.event(input.data_source)
+        def _cancel_prefetch():
+            cancel_prefetch()
+
+        @reactive.Effect
+        @reactive.event(input.go_to_surveyors)
+        def _prefetch_notes():
+            # warm the caches for the chosen data source while the surveyor
+            # fills in the rest of the form
+            nonlocal prefetch_task
+            cancel_prefetch()
+            prefetch_config = survey_config.get("prefetch") or {}
+            # the list is decoded for this only and not kept
+            species = select_prefetch_species(
+                species_list().to_frame(), input.data_source(), prefetch_config
             )
+            if species:
+                prefetch_task = asyncio.create_task(
+                    prefetch_species_notes(
+                        species,
+                        thumbnail_cache,
+                        low_data_mode=input.low_data_mode(),
+                    )
+                )
 
         @reactive.Effect
         @reactive.event(input.go_to_surveyors)
@@ -1049,5 +1329,12 @@ def make_app(
             )
 
     app_dir = Path(__file__).parent
-    app = App(app_ui, server, static_assets=app_dir / "www")
+    app = App(
+        app_ui,
+        server,
+        static_assets={
+            "/": app_dir / "www",
+            thumbnail_cache.url_prefix: Path(thumbnail_cache.directory).resolve(),
+        },
+    )
     return app
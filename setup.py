@@ -12,7 +12,13 @@ setup(
     url="https://github.com/karangattu/fieldsurveys",
     include_package_data=True,
     package_data={"fieldsurveys": ["*"]},
-    entry_points={"console_scripts": ["fieldsurveys = fieldsurveys:copy_app_files"]},
+    entry_points={
+        "console_scripts": [
+            "fieldsurveys = fieldsurveys:copy_app_files",
+            "fieldsurveys-enrich = fieldsurveys:enrich_data_sources",
+            "fieldsurveys-compile = fieldsurveys:compile_data_sources",
+        ]
+    },
     setup_requires=["wheel"],
     install_requires=[
         "beautifulsoup4==4.12.3",
@@ -23,16 +29,17 @@ setup(
         "gspread-dataframe==4.0.0",
         "htmltools==0.5.3",
         "pandas==2.2.3",
+        "Pillow==11.0.0",
         "plotly==5.24.1", 
         "pytz==2024.2",
         "PyYAML==6.0.2",
         "requests==2.32.3",
+        "reverse_geocoder==1.5.1",
         "rsconnect_python==1.24.0",
         "shiny==1.1.0",
         "shinyswatch==0.7.0",
         "timezonefinder==6.5.3",
         "us==3.2.0",
-        "Wikipedia-API==0.7.1",
         "google-api-python-client==2.151.0"
     ],
     extras_require={
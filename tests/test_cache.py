@@ -0,0 +1,94 @@
+import os
+
+from fieldsurveys.app_files import utils
+from fieldsurveys.app_files.cache import MemoryCache, PersistentCache, survey_cache_dir
+
+
+def test_persistent_cache_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    PersistentCache(path).set("key", {"order": "Passeriformes"})
+
+    assert PersistentCache(path).get("key") == {"order": "Passeriformes"}
+
+
+def test_persistent_cache_expires_entries(tmp_path):
+    cache = PersistentCache(str(tmp_path / "cache.sqlite3"), ttl=-1)
+    cache.set("key", "value")
+
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+
+def test_persistent_cache_evicts_least_recently_used(tmp_path):
+    cache = PersistentCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("a") is None
+    assert cache.get("c") == 3
+
+
+def test_persistent_cache_keeps_entries_used_from_memory(tmp_path):
+    cache = PersistentCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # served from memory, its use still counts when entries are evicted
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    restarted = PersistentCache(str(tmp_path / "cache.sqlite3"))
+    assert restarted.get("a") == 1
+    assert restarted.get("b") is None
+
+
+def test_memory_cache_expires_and_evicts():
+    cache = MemoryCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    cache.ttl = -1
+    assert cache.get("c") is None
+
+
+def test_survey_caches_default_to_the_user_cache_directory(monkeypatch, tmp_path):
+    monkeypatch.setattr("sys.platform", "linux")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    survey_path = str(tmp_path / "app" / "survey.yaml")
+
+    default = survey_cache_dir(survey_path)
+    assert os.path.dirname(default) == str(tmp_path / "cache" / "fieldsurveys")
+    assert survey_cache_dir(str(tmp_path / "other" / "survey.yaml")) != default
+    assert survey_cache_dir(survey_path, ".cache") == str(tmp_path / "app" / ".cache")
+
+
+def test_fetch_specimen_classification_uses_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(
+        utils, "taxonomy_cache", PersistentCache(str(tmp_path / "taxonomy.sqlite3"))
+    )
+    key = utils.taxonomy_key("Buteo", "jamaicensis", "Red-tailed Hawk")
+    cached = {
+        "genus": "Buteo",
+        "species": "jamaicensis",
+        "family": "Accipitridae",
+        "order": "Accipitriformes",
+        "class": "Aves",
+    }
+    utils.taxonomy_cache.set(key, cached)
+
+    def mock_get(*args, **kwargs):
+        raise AssertionError("cached classifications should not hit the network")
+
+    monkeypatch.setattr("fieldsurveys.app_files.http_client.get", mock_get)
+
+    result = utils.fetch_specimen_classification(
+        " buteo", "Jamaicensis ", "red-tailed  hawk"
+    )
+
+    assert result == cached
@@ -0,0 +1,162 @@
+import os
+
+import pandas as pd
+import pytest
+
+from fieldsurveys.app_files.catalog import (
+    ALPHA_CODE,
+    BINOMIAL,
+    COMMON_NAME,
+    CatalogWatcher,
+    SpeciesCatalog,
+    SpeciesIndex,
+    compile_data_source,
+    is_compiled,
+    read_data_source,
+)
+
+
+def test_catalog_hands_out_frames_sessions_cannot_share(tmp_path):
+    (tmp_path / "bird.csv").write_text(
+        "Common Name,Genus,Species\nRed-tailed Hawk,Buteo,jamaicensis\n"
+    )
+    catalog = SpeciesCatalog(str(tmp_path), ["bird"])
+
+    first = catalog.get("bird")
+    first.loc[0, "Genus"] = "Accipiter"
+
+    assert list(catalog.get("bird")["Genus"]) == ["Buteo"]
+    assert catalog.index("bird").lookup(COMMON_NAME, "Red-tailed Hawk")["Genus"] == "Buteo"
+    assert list(catalog.get("bird")["Alpha Code"]) == [None]
+    assert catalog.memory_usage()["bird"] > 0
+    with pytest.raises(KeyError):
+        catalog.get("fish")
+
+
+def test_species_index_finds_rows_by_every_display_mode():
+    df = pd.DataFrame(
+        {
+            "Alpha Code": ["RTHA", "SNGO", "SNGO"],
+            "Common Name": ["Red-tailed Hawk", "Snow Goose", "Greater Snow Goose"],
+            "Genus": ["Buteo", "Anser", "Anser"],
+            "Species": ["jamaicensis", "caerulescens", "caerulescens atlantica"],
+        }
+    )
+
+    index = SpeciesIndex(df, "bird")
+
+    hawk = index.lookup(ALPHA_CODE, "RTHA")
+    assert hawk == index.lookup(COMMON_NAME, "Red-tailed Hawk")
+    assert hawk == index.lookup(BINOMIAL, "Buteo jamaicensis")
+    assert index.lookup(BINOMIAL, "Anser caerulescens atlantica")["Common Name"] == "Greater Snow Goose"
+    assert index.lookup(COMMON_NAME, "Osprey") is None
+    # a key on several rows is told apart by the binomial of each row
+    assert index.duplicates == {ALPHA_CODE: ["SNGO"], COMMON_NAME: [], BINOMIAL: []}
+    assert index.choices(ALPHA_CODE) == [
+        "RTHA",
+        "SNGO (Anser caerulescens)",
+        "SNGO (Anser caerulescens atlantica)",
+    ]
+    assert index.search(ALPHA_CODE, "greater snow")[0] == "SNGO (Anser caerulescens atlantica)"
+    assert index.lookup(ALPHA_CODE, "SNGO (Anser caerulescens atlantica)")["Common Name"] == "Greater Snow Goose"
+    assert index.lookup(ALPHA_CODE, "SNGO") is None
+
+
+def test_species_index_search_tolerates_partial_and_misspelled_names():
+    df = pd.DataFrame(
+        {
+            "Alpha Code": ["COHA", "RTHA", "RSHA", "HAWO"],
+            "Common Name": ["Cooper's Hawk", "Red-tailed Hawk", "Red-shouldered Hawk", "Hairy Woodpecker"],
+            "Genus": ["Accipiter", "Buteo", "Buteo", "Leuconotopicus"],
+            "Species": ["cooperii", "jamaicensis", "lineatus", "villosus"],
+        }
+    )
+    index = SpeciesIndex(df)
+
+    assert index.search(COMMON_NAME, "red tail hawk")[0] == "Red-tailed Hawk"
+    assert index.search(COMMON_NAME, "RTHA") == ["Red-tailed Hawk"]
+    assert index.search(ALPHA_CODE, "Buteo lin")[0] == "RSHA"
+    assert index.search(BINOMIAL, "hairy wodpecker") == ["Leuconotopicus villosus"]
+    assert index.search(COMMON_NAME, "red", limit=1) == ["Red-tailed Hawk"]
+    assert index.search(ALPHA_CODE, "", limit=2) == ["COHA", "RTHA"]
+
+
+def test_catalog_loads_compiled_data_sources(tmp_path):
+    csv_path = tmp_path / "bird.csv"
+    csv_path.write_text(
+        "Alpha Code,Common Name,Genus,Species,Clutch Size\n"
+        "RTHA,Red-tailed Hawk,Buteo,jamaicensis,3\n"
+        "SNGO,Snow Goose,Anser,caerulescens,4\n"
+        ",Rock Pigeon,Columba,livia,2\n"
+    )
+    compiled_dir = tmp_path / "compiled"
+    parsed = SpeciesCatalog(str(tmp_path), ["bird"])
+    compiled = SpeciesCatalog(str(tmp_path), ["bird"], compiled_dir=str(compiled_dir))
+
+    pd.testing.assert_frame_equal(compiled.get("bird"), read_data_source(str(csv_path)))
+    assert is_compiled(str(compiled_dir / "bird"), str(csv_path))
+    # every array stays memory-mapped
+    assert compiled.memory_usage()["bird"] == 0
+    assert compiled.memory_usage(mapped=True)["bird"] > 0
+    assert parsed.index("bird").memory_usage(mapped=True) == 0
+    for query in ["red tail", "snwo goose", "columba", ""]:
+        assert compiled.index("bird").search(COMMON_NAME, query) == parsed.index(
+            "bird"
+        ).search(COMMON_NAME, query)
+    assert compiled.index("bird").lookup(ALPHA_CODE, "SNGO") == {
+        "Alpha Code": "SNGO",
+        "Common Name": "Snow Goose",
+        "Genus": "Anser",
+        "Species": "caerulescens",
+        "Clutch Size": 4,
+    }
+    assert compiled.index("bird").lookup(ALPHA_CODE, "") is None
+
+    # compiling the same CSV again, e.g. in another worker, keeps the version
+    # already there; a changed CSV gets a new version and the old one goes
+    version = compile_data_source(str(csv_path), str(compiled_dir / "bird"))
+    assert os.listdir(compiled_dir / "bird") == [os.path.basename(version)]
+    csv_path.write_text("Common Name,Genus,Species\nSnowy Owl,Bubo,scandiacus\n")
+    assert not is_compiled(str(compiled_dir / "bird"), str(csv_path))
+    reloaded = SpeciesCatalog(str(tmp_path), ["bird"], compiled_dir=str(compiled_dir))
+    assert list(reloaded.get("bird")[COMMON_NAME]) == ["Snowy Owl"]
+    assert list(reloaded.get("bird")[ALPHA_CODE]) == [None]
+    assert len(os.listdir(compiled_dir / "bird")) == 1
+
+
+def test_catalog_watcher_reloads_changed_data_sources(tmp_path):
+    bird_csv = tmp_path / "bird.csv"
+    bird_csv.write_text("Common Name,Genus,Species\nRed-tailed Hawk,Buteo,jamaicensis\n")
+    (tmp_path / "fish.csv").write_text("Common Name,Genus,Species\nCoho Salmon,Oncorhynchus,kisutch\n")
+    survey_path = tmp_path / "survey.yaml"
+    survey_path.write_text("survey_data_sources:\n  - bird\n")
+    catalog = SpeciesCatalog(str(tmp_path), ["bird"])
+    watcher = CatalogWatcher(catalog, str(survey_path))
+    index = catalog.index("bird")
+
+    assert watcher.check() == []
+
+    bird_csv.write_text(
+        "Common Name,Genus,Species\nRed-tailed Hawk,Buteo,jamaicensis\nSnow Goose,Anser,caerulescens\n"
+    )
+    survey_path.write_text("survey_data_sources:\n  - bird\n  - fish\n  - reptile\n")
+    assert watcher.check() == ["bird", "fish"]
+    # the missing reptile.csv is left out
+    assert catalog.data_sources == ["bird", "fish"]
+    assert len(catalog.get("bird")) == 2
+    assert catalog.index("bird").lookup(COMMON_NAME, "Snow Goose")["Genus"] == "Anser"
+    # what a session took before keeps working unchanged
+    assert len(index) == 1
+    assert index.lookup(COMMON_NAME, "Snow Goose") is None
+
+    # a list that fails to load keeps its current version
+    bird_csv.write_text(
+        "Common Name,Genus,Species\nRed-tailed Hawk,Buteo,jamaicensis\nSnowy Owl,Bubo,scandiacus,,\n"
+    )
+    assert watcher.check() == []
+    assert len(catalog.get("bird")) == 2
+
+    survey_path.write_text("survey_data_sources:\n  - fish\n")
+    watcher.check()
+    with pytest.raises(KeyError):
+        catalog.get("bird")
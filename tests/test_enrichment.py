@@ -0,0 +1,69 @@
+import asyncio
+import datetime
+
+from fieldsurveys.app_files import enrichment
+
+
+def test_enrich_observation_marks_failed_lookups(monkeypatch):
+    def mock_classification(genus, species, common_name):
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr(enrichment, "fetch_specimen_classification", mock_classification)
+    monkeypatch.setattr(enrichment, "get_weather_underground_temperature", lambda lat, lon: "Temp: 60°F")
+
+    observed_at = datetime.datetime(2024, 5, 1, 17, 30, tzinfo=datetime.timezone.utc)
+    fields = enrichment.enrich_observation(
+        "Buteo", "jamaicensis", "Red-tailed Hawk", "37.4803", "-122.0786",
+        observed_at=observed_at, timezone="America/Los_Angeles",
+    )
+
+    assert fields == {
+        "Class": enrichment.UNAVAILABLE,
+        "Order": enrichment.UNAVAILABLE,
+        "Family": enrichment.UNAVAILABLE,
+        "Weather": "Temp: 60°F",
+        "Time observed": "10:30 AM",
+    }
+
+
+def test_enrichment_queue_updates_rows_once():
+    applied = []
+
+    async def main():
+        async def on_done(row_id):
+            fields = queue.take(row_id)
+            if fields:
+                applied.append(row_id)
+
+        queue = enrichment.EnrichmentQueue(on_done)
+        queue.submit("a", lambda: {"Weather": "sunny"})
+        queue.submit("b", lambda: {"Weather": "rainy"})
+        queue.cancel("b")
+        await asyncio.sleep(0.1)
+        return queue
+
+    queue = asyncio.run(main())
+
+    assert applied == ["a"]
+    assert queue.pending == []
+
+
+def test_local_time_survives_a_failed_timezone_lookup(monkeypatch):
+    def mock_timezone_at(latitude, longitude):
+        raise OSError("timezone data missing")
+
+    monkeypatch.setattr(enrichment.geo, "timezone_at", mock_timezone_at)
+    observed_at = datetime.datetime(2024, 5, 1, 17, 30, tzinfo=datetime.timezone.utc)
+
+    assert enrichment.local_time(observed_at, "37.4803", "-122.0786") == enrichment.UNAVAILABLE
+    assert enrichment.local_time(
+        observed_at, "37.4803", "-122.0786", timezone="America/Los_Angeles"
+    ) == "10:30 AM"
+
+
+def test_observation_location_falls_back_to_the_default():
+    assert enrichment.observation_location({"GPS Location": "38.1, -121.5"}) == ("38.1", "-121.5")
+    assert enrichment.observation_location({"GPS Location": "None given"}) == (
+        enrichment.DEFAULT_LATITUDE,
+        enrichment.DEFAULT_LONGITUDE,
+    )
@@ -0,0 +1,102 @@
+from fieldsurveys.app_files import geo
+
+
+def test_geohash():
+    assert geo.geohash(57.64911, 10.40744, precision=11) == "u4pruydqqvj"
+    assert geo.geohash(37.4803, -122.0786, precision=5) == "9q9jn"
+
+
+def test_reverse_geocode_reuses_nearby_lookups(monkeypatch):
+    class MockLocation:
+        raw = {"address": {"country_code": "us", "state": "California", "village": "Woodside"}}
+
+    calls = []
+
+    def mock_reverse(query):
+        calls.append(query)
+        return MockLocation()
+
+    monkeypatch.setattr(geo, "_reverse", mock_reverse)
+    # restored after the test, configure_geocoder replaces them
+    for name in ["geocode_precision", "geocode_cache", "geocode_mode"]:
+        monkeypatch.setattr(geo, name, getattr(geo, name))
+    geo.configure_geocoder(precision=6)
+
+    first = geo.reverse_geocode("37.43001", "-122.25001")
+    second = geo.reverse_geocode("37.43010", "-122.25010")
+
+    assert first == second == {"country_code": "us", "state": "California", "city": "Woodside"}
+    assert calls == ["37.43001,-122.25001"]
+
+
+def test_nominatim_lookups_go_through_the_shared_http_client(monkeypatch):
+    requested = []
+
+    class MockResponse:
+        status_code = 200
+
+        def json(self):
+            return {
+                "display_name": "Palo Alto, California, United States",
+                "lat": "37.44",
+                "lon": "-122.14",
+                "address": {"country_code": "us", "state": "California", "city": "Palo Alto"},
+            }
+
+    def mock_get(url, **kwargs):
+        requested.append((url, kwargs))
+        return MockResponse()
+
+    monkeypatch.setattr("fieldsurveys.app_files.http_client.get", mock_get)
+    monkeypatch.setattr(geo, "geocode_mode", "online")
+    monkeypatch.setattr(geo, "geocode_cache", geo.MemoryCache())
+
+    place = geo.reverse_geocode(37.44, -122.14)
+
+    assert place == {"country_code": "us", "state": "California", "city": "Palo Alto"}
+    (url, kwargs), = requested
+    assert url.startswith("https://nominatim.openstreetmap.org/reverse")
+    # the http client's timeout for the host applies
+    assert "timeout" not in kwargs
+
+
+def test_offline_reverse_geocode_uses_gazetteer(monkeypatch):
+    def mock_reverse(query):
+        raise AssertionError("Nominatim should not be called in offline mode")
+
+    monkeypatch.setattr(geo, "_reverse", mock_reverse)
+    for name in ["geocode_precision", "geocode_cache", "geocode_mode"]:
+        monkeypatch.setattr(geo, name, getattr(geo, name))
+    geo.configure_geocoder(mode="offline")
+
+    places = geo.reverse_geocode_many([("37.38605", "-122.08385"), (51.5214588, -0.1729636)])
+    assert places[0] == {"country_code": "us", "state": "California", "city": "Mountain View"}
+    assert places[1]["country_code"] == "gb"
+    assert geo.reverse_geocode(37.38605, -122.08385) == places[0]
+
+
+def test_timezones_at_resolves_each_cell_once(monkeypatch):
+    calls = []
+
+    class MockTimezoneFinder:
+        def __init__(self, in_memory=False):
+            pass
+
+        def certain_timezone_at(self, lng, lat):
+            calls.append((lat, lng))
+            return "America/Los_Angeles" if lng < -100 else None
+
+    monkeypatch.setattr(geo, "TimezoneFinder", MockTimezoneFinder)
+    monkeypatch.setattr(geo, "_timezone_finder", None)
+    # restored after the test, configure_timezone_finder replaces them
+    for name in ["timezone_precision", "timezone_cache"]:
+        monkeypatch.setattr(geo, name, getattr(geo, name))
+    geo.configure_timezone_finder(precision=6)
+
+    timezones = geo.timezones_at(
+        [("37.43001", "-122.25001"), (37.43010, -122.25010), (0.0, -30.0)]
+    )
+
+    assert timezones == ["America/Los_Angeles", "America/Los_Angeles", None]
+    assert geo.timezone_at(0.0, -30.0) is None
+    assert calls == [(37.43001, -122.25001), (0.0, -30.0)]
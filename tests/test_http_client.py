@@ -0,0 +1,36 @@
+from fieldsurveys.app_files import http_client
+from fieldsurveys.app_files.http_client import HttpClient, configure_http_client
+
+
+def test_http_client_applies_per_host_timeouts(monkeypatch):
+    client = HttpClient(timeout=15, host_timeouts={"www.wunderground.com": 30})
+    timeouts = {}
+
+    def mock_request(method, url, **kwargs):
+        timeouts[url] = kwargs["timeout"]
+
+    monkeypatch.setattr(client.session, "request", mock_request)
+
+    client.get("https://www.wunderground.com/weather/us/ca/woodside")
+    client.get("https://api.inaturalist.org/v1/taxa", timeout=5)
+    client.post("https://api.imgur.com/3/upload")
+
+    assert timeouts == {
+        "https://www.wunderground.com/weather/us/ca/woodside": 30,
+        "https://api.inaturalist.org/v1/taxa": 5,
+        "https://api.imgur.com/3/upload": 15,
+    }
+
+
+def test_configure_http_client_reuses_one_pooled_session(monkeypatch):
+    # restored after the test, configure_http_client replaces it
+    monkeypatch.setattr(http_client, "client", http_client.client)
+    client = configure_http_client(
+        {"retries": 3, "connections_per_host": 4, "max_concurrency_per_host": 2}
+    )
+    adapter = client.session.get_adapter("https://api.inaturalist.org")
+
+    assert adapter is client.session.get_adapter("https://www.wunderground.com")
+    assert adapter.max_retries.total == 3
+    assert adapter._pool_maxsize == 4
+    assert client._semaphore("api.inaturalist.org")._value == 2
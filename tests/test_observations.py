@@ -0,0 +1,129 @@
+from fieldsurveys.app_files.enrichment import PENDING, ROW_ID
+from fieldsurveys.app_files.observations import ObservationStore, grid_window
+
+
+def test_observation_store_appends_updates_and_deletes_by_id():
+    store = ObservationStore(columns=["Common Name", "Weather"])
+    for row_id, name in [("a", "Red-tailed Hawk"), ("b", "Snow Goose"), ("c", "Rock Pigeon")]:
+        store.append({ROW_ID: row_id, "Common Name": name, "Weather": PENDING})
+    store.append({ROW_ID: "d", "Common Name": "Snowy Owl", "Count": "2"})
+    first = store.to_frame()
+
+    assert list(first.columns) == ["Common Name", "Weather", ROW_ID, "Count"]
+    assert list(first["Count"]) == [None, None, None, "2"]
+    assert store.to_frame() is first
+
+    store.update("b", {"Weather": "sunny"})
+    assert store.row_version("b") == 5
+    assert store.row_version("c") == 3
+    store.delete("a")
+    store.delete("c")
+    # the frame of a previous version is left as it was
+    assert len(first) == 4
+    assert store.version == 7
+    assert len(store) == 2
+    assert store.row_ids() == ["b", "d"]
+    assert store.get("a") is None
+    assert store.get("b")["Weather"] == "sunny"
+
+    # enriched fields arriving after a delete are dropped
+    store.update("a", {"Weather": "rainy"})
+    frame = store.to_frame()
+    assert list(frame.index) == [0, 1]
+    assert list(frame["Common Name"]) == ["Snow Goose", "Snowy Owl"]
+
+    store.append({ROW_ID: "e", "Common Name": "Coho Salmon"})
+    assert store.row_ids() == ["b", "d", "e"]
+    store.clear()
+    assert len(store) == 0
+    assert list(store.to_frame().columns) == ["Common Name", "Weather", ROW_ID, "Count"]
+
+
+def test_observation_store_journals_its_changes():
+    store = ObservationStore(columns=["Common Name"])
+    assert store.take_changes() == []
+    store.append({ROW_ID: "a", "Common Name": "Red-tailed Hawk"})
+    store.append({ROW_ID: "b", "Common Name": "Snow Goose"})
+    store.update("a", {"Weather": "sunny"})
+    store.delete("b")
+
+    assert store.take_changes() == [
+        {"op": "clear"},
+        {"op": "append", "id": "a", "row": {ROW_ID: "a", "Common Name": "Red-tailed Hawk"}},
+        {"op": "append", "id": "b", "row": {ROW_ID: "b", "Common Name": "Snow Goose"}},
+        {"op": "update", "id": "a", "fields": {"Weather": "sunny"}},
+        {"op": "delete", "id": "b"},
+    ]
+    assert store.take_changes() == []
+
+    store.append({ROW_ID: "c", "Common Name": "Rock Pigeon"})
+    store.clear()
+    store.append({ROW_ID: "d", "Common Name": "Snowy Owl"})
+    assert [change["op"] for change in store.take_changes()] == ["clear", "append"]
+
+
+def test_deleting_the_selected_row_of_the_second_grid_page():
+    store = ObservationStore(columns=["Common Name"])
+    names = ["Red-tailed Hawk", "Snow Goose", "Rock Pigeon", "Snowy Owl", "Coho Salmon"]
+    for number, name in enumerate(names):
+        store.append({ROW_ID: str(number), "Common Name": name})
+
+    page, row_ids, rows = grid_window(store.to_frame(), ["Common Name"], 1, 2)
+    assert (page, row_ids) == (1, ["2", "3"])
+    assert list(rows.index) == [0, 1]
+    # the grid reports the selected row by its number on the page
+    selected = row_ids[1]
+    assert store.get(selected)["Common Name"] == "Snowy Owl"
+    store.delete(selected)
+
+    page, row_ids, rows = grid_window(store.to_frame(), ["Common Name"], page, 2)
+    assert (page, row_ids) == (1, ["2", "4"])
+    assert list(rows["Common Name"]) == ["Rock Pigeon", "Coho Salmon"]
+
+    # once the last page is emptied the one before it is shown
+    store.delete("2")
+    store.delete("4")
+    page, row_ids, rows = grid_window(store.to_frame(), ["Common Name"], page, 2)
+    assert (page, row_ids) == (0, ["0", "1"])
+
+
+def replay(journal):
+    # what the browser does with the journal to restore the observations
+    rows = {}
+    for entry in journal:
+        if entry["op"] == "clear":
+            rows.clear()
+        elif entry["op"] == "append":
+            rows[entry["id"]] = dict(entry["row"])
+        elif entry["op"] == "update":
+            rows[entry["id"]].update(entry["fields"])
+        elif entry["op"] == "delete":
+            del rows[entry["id"]]
+    return list(rows.values())
+
+
+def test_replaying_the_journal_of_a_new_session_gives_only_its_rows():
+    journal = []
+    earlier = ObservationStore(columns=["Common Name"])
+    earlier.append({ROW_ID: "a", "Common Name": "Red-tailed Hawk"})
+    journal += earlier.take_changes()
+
+    store = ObservationStore(columns=["Common Name", "Weather"])
+    journal += store.take_changes()
+    # the earlier rows can still be restored until the new session changes
+    assert [row[ROW_ID] for row in replay(journal)] == ["a"]
+
+    store.append({ROW_ID: "b", "Common Name": "Snow Goose", "Weather": PENDING})
+    store.append({ROW_ID: "c", "Common Name": "Rock Pigeon", "Weather": PENDING})
+    journal += store.take_changes()
+    store.update("b", {"Weather": "sunny"})
+    store.delete("c")
+    store.append({ROW_ID: "d", "Common Name": "Snowy Owl", "Count": "2"})
+    journal += store.take_changes()
+
+    expected = store.to_frame().to_dict("records")
+    replayed = [
+        {column: row.get(column) for column in store.to_frame().columns}
+        for row in replay(journal)
+    ]
+    assert replayed == expected
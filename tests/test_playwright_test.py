@@ -154,3 +154,33 @@ def test_shiny_app(page: Page, start_shiny_app) -> None:
     expect(page.get_by_text("Select the abundance")).not_to_be_visible()
     expect(page.get_by_text("Select the life stage")).not_to_be_visible()
     expect(page.get_by_text("Enter the height of the plant")).not_to_be_visible()
+
+
+@pytest.mark.only_browser("chromium")
+def test_specimen_search_narrowing_query(page: Page, start_shiny_app) -> None:
+    page.goto(f"http://localhost:{PORT}/")
+    page.get_by_label("Bandwidth Saver").check()
+    page.get_by_text("butterfly").click()
+    page.get_by_role("button", name="Proceed to next step").click()
+    page.locator("#surveyors").locator("..").locator("> .multi").click()
+    page.get_by_text("Cole").click()
+    page.get_by_label("Choose Surveyor(s)*:").press("Escape")
+    page.get_by_role("button", name="Proceed to next step").click()
+    page.get_by_role("button", name="Proceed to next step").click()
+
+    # the matches of "lange" are already loaded when the query narrows
+    specimen = page.locator("#specimen-selectized")
+    page.locator("#specimen").locator("..").locator("> .single").click()
+    specimen.press_sequentially("lange", delay=50)
+    expect(page.locator(".selectize-dropdown-content")).to_contain_text(
+        "Lange's Metalmark"
+    )
+    specimen.press_sequentially("'s m", delay=50)
+    expect(page.locator(".selectize-dropdown-content")).to_contain_text(
+        "Lange's Metalmark"
+    )
+    # surrounding spaces do not lose the server's ranking
+    specimen.press_sequentially(" ", delay=50)
+    expect(page.locator(".selectize-dropdown-content .option").first).to_contain_text(
+        "Lange's Metalmark"
+    )
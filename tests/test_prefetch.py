@@ -0,0 +1,67 @@
+import asyncio
+from types import SimpleNamespace
+
+import pandas as pd
+
+from fieldsurveys.app_files import prefetch
+from fieldsurveys.app_files.prefetch import select_prefetch_species
+
+
+def test_select_prefetch_species_prefers_frequency_list():
+    df = pd.DataFrame(
+        {
+            "Alpha Code": ["ABDU", "RTHA", "UNKN", "RSHA"],
+            "Common Name": [
+                "American Black Duck",
+                "Red-tailed Hawk",
+                "Unknown bird",
+                "Red-shouldered Hawk",
+            ],
+            "Genus": ["Anas", "Buteo", "unknown", "Buteo"],
+            "Species": ["rubripes", "jamaicensis", "unknown", "lineatus"],
+        }
+    )
+    config = {"top_n": 2, "species": {"bird": ["RSHA", "Unknown bird", "ABDU"]}}
+
+    assert [row["Common Name"] for row in select_prefetch_species(df, "bird", config)] == [
+        "Red-shouldered Hawk",
+        "American Black Duck",
+    ]
+    assert [row["Common Name"] for row in select_prefetch_species(df, "fish", config)] == [
+        "American Black Duck",
+        "Red-tailed Hawk",
+    ]
+
+
+def test_prefetches_of_all_sessions_share_one_rate_limit(monkeypatch):
+    monkeypatch.setattr(prefetch, "_next_turn", 0.0)
+    monkeypatch.setattr(prefetch, "requests_per_second", 1.0)
+    prefetch.configure_prefetch({"requests_per_second": 20})
+    species = [
+        {"Genus": "Buteo", "Species": "jamaicensis", "Common Name": "Red-tailed Hawk"},
+        {"Genus": "Anser", "Species": "caerulescens", "Common Name": "Snow Goose"},
+    ]
+
+    thumbnail_cache = SimpleNamespace(get_species_variants=None)
+
+    async def main():
+        started = []
+
+        async def mock_warm(func, *args, **kwargs):
+            started.append(asyncio.get_running_loop().time())
+
+        monkeypatch.setattr(prefetch, "_warm", mock_warm)
+        started.append(asyncio.get_running_loop().time())
+        await asyncio.gather(
+            prefetch.prefetch_species_notes(species, thumbnail_cache, low_data_mode=True),
+            prefetch.prefetch_species_notes(species, thumbnail_cache, low_data_mode=True),
+        )
+        return started
+
+    started = asyncio.run(main())
+
+    # two lookups per species for each of the two sessions, 1/20 s apart; a
+    # lookup may start late but never before its turn
+    start, started = started[0], started[1:]
+    assert len(started) == 8
+    assert all(time - start >= turn / 20 - 0.005 for turn, time in enumerate(started))
@@ -0,0 +1,22 @@
+from fieldsurveys.app_files.search import SearchIndex, tokenize
+
+
+def test_tokenize():
+    assert tokenize("Cooper's Hawk (RTHA)") == ["cooper", "s", "hawk", "rtha"]
+
+
+def test_search_ranks_exact_then_prefix_then_typo_matches():
+    index = SearchIndex(
+        [
+            "Snow Goose Anser caerulescens",
+            "Goshawk Accipiter gentilis",
+            "Gosling",
+            "Goose",
+        ]
+    )
+
+    assert index.search("goose") == [3, 0]
+    assert index.search("gos") == [2, 1]
+    assert index.search("gosawk") == [1]
+    assert index.search("anser caerulescns") == [0]
+    assert index.search("zebra") == []
@@ -0,0 +1,37 @@
+import io
+
+from PIL import Image
+
+from fieldsurveys.app_files.thumbnails import THUMBNAIL_SIZES, ThumbnailCache
+
+
+def test_thumbnail_cache_downloads_each_image_once(monkeypatch, tmp_path):
+    buffer = io.BytesIO()
+    Image.new("RGB", (2000, 1000), "green").save(buffer, "JPEG")
+
+    class MockResponse:
+        content = buffer.getvalue()
+
+        def raise_for_status(self):
+            pass
+
+    calls = []
+
+    def mock_get(url, **kwargs):
+        calls.append(url)
+        return MockResponse()
+
+    monkeypatch.setattr("fieldsurveys.app_files.http_client.get", mock_get)
+    cache = ThumbnailCache(
+        str(tmp_path / "thumbnails"), index_path=str(tmp_path / "index.sqlite3")
+    )
+
+    variants = cache.get_variants("https://example.com/large.jpg")
+    assert cache.get_variants("https://example.com/large.jpg") == variants
+    assert calls == ["https://example.com/large.jpg"]
+
+    for size, pixels in THUMBNAIL_SIZES.items():
+        assert variants[size].startswith("/thumbnails/")
+        filename = variants[size].rsplit("/", 1)[-1]
+        with Image.open(tmp_path / "thumbnails" / filename) as image:
+            assert max(image.size) == pixels
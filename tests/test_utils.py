@@ -1,3 +1,4 @@
+from fieldsurveys.app_files import utils
 from fieldsurveys.app_files.utils import get_species_image
 
 
@@ -10,9 +11,196 @@ def test_get_species_image_api_failure(monkeypatch):
     def mock_get(*args, **kwargs):
         return MockResponse(500)
 
-    monkeypatch.setattr("requests.get", mock_get)
+    monkeypatch.setattr("fieldsurveys.app_files.http_client.get", mock_get)
 
     result = get_species_image("Genus", "Species", 0)
 
     # Assert that the result is the default image URL
     assert result == "https://i.ibb.co/m6YDp69/sorry.jpg"
+
+
+def test_taxonomy_sidecar_round_trip(monkeypatch, tmp_path):
+    csv_dir = tmp_path / "data"
+    csv_dir.mkdir()
+    (csv_dir / "bird.csv").write_text(
+        "Alpha Code,Common Name,Genus,Species\n"
+        "RTHA,Red-tailed Hawk,Buteo,jamaicensis\n"
+        "RSHA,Red-shouldered Hawk,Buteo,lineatus\n"
+    )
+    classified = []
+    fetch_specimen_classification = utils.fetch_specimen_classification
+
+    def mock_fetch(genus, species, common_name):
+        classified.append(common_name)
+        return {
+            "genus": genus,
+            "species": species,
+            "family": "Accipitridae",
+            "order": "Accipitriformes",
+            "class": "Aves",
+        }
+
+    monkeypatch.setattr(utils, "fetch_specimen_classification", mock_fetch)
+    monkeypatch.setattr(utils, "precomputed_taxonomy", {})
+    monkeypatch.setattr(utils.time, "sleep", lambda seconds: None)
+    sources = utils.build_taxonomy_sidecar(
+        {"survey_data_sources": ["bird"]}, str(csv_dir)
+    )
+
+    assert classified == ["Red-tailed Hawk", "Red-shouldered Hawk"]
+    assert len(sources["bird"]) == 2
+    assert utils.load_taxonomy_sidecar(str(csv_dir / utils.TAXONOMY_SIDECAR)) == 2
+
+    def mock_get(*args, **kwargs):
+        raise AssertionError("precomputed classifications should not hit the network")
+
+    monkeypatch.setattr("fieldsurveys.app_files.http_client.get", mock_get)
+    result = fetch_specimen_classification("Buteo", "lineatus", "Red-shouldered Hawk")
+
+    assert result["family"] == "Accipitridae"
+
+
+def test_taxonomy_sidecar_is_rate_limited_and_lists_skipped_rows(monkeypatch, tmp_path, capsys):
+    (tmp_path / "bird.csv").write_text(
+        "Alpha Code,Common Name,Genus,Species\n"
+        "RTHA,Red-tailed Hawk,Buteo,jamaicensis\n"
+        "XXXX,Mystery Bird,Nonexistus,birdus\n"
+        "RTHA,Red-tailed Hawk,Buteo,jamaicensis\n"
+    )
+    clock = [0.0]
+    sleeps = []
+
+    def mock_sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    def mock_fetch(genus, species, common_name):
+        if genus == "Nonexistus":
+            raise ValueError("no taxon found")
+        return {"class": "Aves"}
+
+    monkeypatch.setattr(utils.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(utils.time, "sleep", mock_sleep)
+    monkeypatch.setattr(utils, "fetch_specimen_classification", mock_fetch)
+    sources = utils.build_taxonomy_sidecar(
+        {"survey_data_sources": ["bird"], "taxonomy_sidecar": {"requests_per_second": 4}},
+        str(tmp_path),
+    )
+
+    # two requests per classification, the repeated row is not looked up again
+    assert sleeps == [0.0, 0.5]
+    assert len(sources["bird"]) == 1
+    assert "bird row 2: Nonexistus birdus (Mystery Bird)" in capsys.readouterr().out
+
+
+def test_get_species_images_fetches_taxon_once(monkeypatch):
+    class MockResponse:
+        status_code = 200
+
+        def __init__(self, data):
+            self.data = data
+
+        def json(self):
+            return self.data
+
+    calls = []
+
+    def mock_get(url, params=None, **kwargs):
+        calls.append(url)
+        if url.endswith("autocomplete"):
+            return MockResponse({"results": [{"id": 5212}]})
+        photos = [{"photo": {"large_url": f"https://example.com/{i}.jpg"}} for i in range(3)]
+        return MockResponse({"results": [{"taxon_photos": photos}]})
+
+    monkeypatch.setattr("fieldsurveys.app_files.http_client.get", mock_get)
+
+    first = utils.get_species_images("Mockgenus", "mockspecies")
+    second = utils.get_species_image("Mockgenus", "mockspecies", image_number=1)
+
+    assert first == ["https://example.com/0.jpg", "https://example.com/1.jpg"]
+    assert second == "https://example.com/1.jpg"
+    assert len(calls) == 2
+
+
+def test_get_summaries_for_specimens_batches_titles(monkeypatch):
+    class MockResponse:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {
+                "query": {
+                    "normalized": [{"from": "buteo lineatus", "to": "Buteo lineatus"}],
+                    "redirects": [
+                        {"from": "Buteo lineatus", "to": "Red-shouldered hawk"}
+                    ],
+                    "pages": {
+                        "1": {"title": "Red-shouldered hawk", "extract": " A hawk. "},
+                        "-1": {"title": "Nonexistent species", "missing": ""},
+                    },
+                }
+            }
+
+    requested = []
+
+    def mock_get(url, params=None, **kwargs):
+        requested.append(params["titles"])
+        return MockResponse()
+
+    monkeypatch.setattr("fieldsurveys.app_files.http_client.get", mock_get)
+    monkeypatch.setattr(utils, "summary_cache", utils.MemoryCache())
+
+    summaries = utils.get_summaries_for_specimens(
+        ["buteo lineatus", "Nonexistent species", "buteo lineatus"]
+    )
+
+    assert requested == ["buteo lineatus|Nonexistent species"]
+    assert summaries == {
+        "buteo lineatus": "A hawk.",
+        "Nonexistent species": "No notes found",
+    }
+    assert utils.get_summary_for_specimen("buteo", "lineatus") == "A hawk."
+
+
+def test_weather_is_fetched_once_per_cell_and_bucket(monkeypatch):
+    scraped = []
+
+    def mock_scrape(latitude, longitude):
+        scraped.append((latitude, longitude))
+        return "61 °F"
+
+    monkeypatch.setattr(utils, "_scrape_weather_underground", mock_scrape)
+    # restored after the test, configure_weather_cache replaces them
+    for name in ["weather_cache", "weather_precision", "weather_bucket_seconds"]:
+        monkeypatch.setattr(utils, name, getattr(utils, name))
+    cache = utils.configure_weather_cache(bucket_minutes=15, precision=5)
+
+    readings = [
+        utils.get_weather_underground_temperature("37.4803", "-122.0786"),
+        utils.get_weather_underground_temperature("37.4810", "-122.0790"),
+        utils.get_weather_underground_temperature("40.7128", "-74.0060"),
+    ]
+
+    assert readings == ["61 °F"] * 3
+    assert len(scraped) == 2
+    assert cache.stats() == {"hits": 1, "misses": 2, "size": 2}
+
+
+def test_log_cache_stats_reports_every_lookup_cache(monkeypatch, capsys):
+    for module, name in [
+        (utils, "weather_cache"),
+        (utils, "summary_cache"),
+        (utils.geo, "geocode_cache"),
+        (utils.geo, "timezone_cache"),
+    ]:
+        monkeypatch.setattr(module, name, utils.MemoryCache())
+    utils.summary_cache.set("Buteo jamaicensis", "A hawk.")
+    utils.summary_cache.get("Buteo jamaicensis")
+    utils.summary_cache.get("Anser caerulescens")
+
+    utils.log_cache_stats()
+
+    output = capsys.readouterr().out
+    assert "summary 1 hits/1 misses (1 entries)" in output
+    assert "weather 0 hits/0 misses (0 entries)" in output
+    assert "timezone" in output and "geocode" in output